@@ -0,0 +1,220 @@
+"""Load test of the movies API: throughput and latency of the same requests against running servers.
+
+Every connection sends its requests one after another over HTTP/1.1 keep-alive, so the concurrency is
+the number of connections. Requests are the pages of the list and the details of the movies on them,
+taken at random, so the responses are not only the cached ones. Stages of growing concurrency show the
+max RPS of every server and the latency when it is saturated.
+
+The client is a single asyncio process: check that it is not the bottleneck by its CPU usage, or run it
+on another host.
+
+Usage (from the movies_admin directory, the servers are started separately):
+    gunicorn -c gunicorn_conf.py config.wsgi -b 127.0.0.1:8000
+    gunicorn -c gunicorn_asgi_conf.py config.asgi -b 127.0.0.1:8001
+    python -m benchmark.load_test --target sync=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import time
+from urllib.parse import urlsplit
+
+LIST_PATH = '/api/v1/movies/'
+DEFAULT_CONCURRENCY = (100, 500, 1000)
+
+
+class HttpError(Exception):
+    pass
+
+
+async def read_response(reader: asyncio.StreamReader) -> (int, bytes, bool):
+    """
+    Read a response with the body by Content-Length, chunks or until the connection is closed.
+    :return: status, body and whether the connection can be reused.
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    status = int(status_line.split()[1])
+    headers = {}
+    for line in header_lines:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    keep_alive = headers.get('connection', '').lower() != 'close'
+    if 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            chunks.append(await reader.readexactly(size + 2))
+            if size == 0:
+                break
+        body = b''.join(chunk[:-2] for chunk in chunks)
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return status, body, keep_alive
+
+
+class Connection:
+    """Keep-alive connection to the server, opened again when the server closes it."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path: str) -> (int, bytes):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        self.writer.write(f'GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n\r\n'.encode())
+        try:
+            await self.writer.drain()
+            status, body, keep_alive = await read_response(self.reader)
+        except (OSError, asyncio.IncompleteReadError) as error:
+            self.close()
+            raise HttpError(error)
+        if not keep_alive:
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def sample_paths(url: str, pages: int) -> list:
+    """Paths of the first pages of the list and the details of the movies on them."""
+    parts = urlsplit(url)
+    connection = Connection(parts.hostname, parts.port or 80)
+    paths = []
+    try:
+        for page in range(1, pages + 1):
+            path = f'{LIST_PATH}?page={page}'
+            status, body = await connection.get(path)
+            if status != 200:
+                sys.exit(f'GET {url}{path}: {status}')
+            paths.append(path)
+            paths.extend(f"{LIST_PATH}{movie['id']}" for movie in json.loads(body)['results'])
+    finally:
+        connection.close()
+    return paths
+
+
+async def run_stage(url: str, paths: list, concurrency: int, duration: float, timeout: float) -> dict:
+    """Requests of the connections for the duration, latencies of the responses with status 200."""
+    parts = urlsplit(url)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        connection = Connection(parts.hostname, parts.port or 80)
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    status, _ = await asyncio.wait_for(connection.get(random.choice(paths)), timeout)
+                except (HttpError, asyncio.TimeoutError):
+                    connection.close()
+                    errors += 1
+                    continue
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / seconds,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Percentile of the sorted values, nearest rank."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def raise_open_files_limit(connections: int):
+    """Every connection is a file descriptor, the default soft limit is often 1024."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = connections + 100
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        limit = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+
+
+def print_report(results: dict):
+    print(f"{'target':<10}{'conn':>6}{'requests':>10}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, stages in results.items():
+        for stage in stages:
+            print(f"{name:<10}{stage['concurrency']:>6}{stage['requests']:>10}{stage['errors']:>8}"
+                  f"{stage['rps']:>9.0f}{stage['p50_ms']:>9.1f}{stage['p99_ms']:>9.1f}{stage['max_ms']:>9.1f}")
+
+    print()
+    for name, stages in results.items():
+        best = max(stages, key=lambda stage: stage['rps'])
+        top = max(stages, key=lambda stage: stage['concurrency'])
+        print(f"{name}: max {best['rps']:.0f} rps at {best['concurrency']} connections, "
+              f"p99 {top['p99_ms']:.1f} ms at {top['concurrency']} connections")
+
+
+async def main(args) -> dict:
+    targets = dict(target.split('=', 1) for target in args.target)
+    results = {}
+    for name, url in targets.items():
+        paths = await sample_paths(url, args.pages)
+        results[name] = []
+        for concurrency in args.concurrency:
+            stage = await run_stage(url, paths, concurrency, args.duration, args.timeout)
+            print(f"{name} {concurrency} connections: {stage['rps']:.0f} rps, p99 {stage['p99_ms']:.1f} ms, "
+                  f"{stage['errors']} errors", file=sys.stderr)
+            results[name].append(stage)
+            # Connections closed by the stage leave the server before the next one
+            await asyncio.sleep(args.pause)
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Load test of the movies API servers at growing concurrency.')
+    parser.add_argument('--target', action='append', required=True,
+                        help='name=url of a running server, e.g. sync=http://127.0.0.1:8000, repeat for every server')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=list(DEFAULT_CONCURRENCY),
+                        help='numbers of connections of the stages')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of every stage')
+    parser.add_argument('--pages', type=int, default=20, help='pages of the list requested with their movies')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before a request counts as an error')
+    parser.add_argument('--pause', type=float, default=2, help='seconds between the stages')
+    parser.add_argument('--output', help='save the results as JSON')
+    args = parser.parse_args()
+
+    raise_open_files_limit(max(args.concurrency))
+    results = asyncio.run(main(args))
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
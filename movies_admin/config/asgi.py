@@ -0,0 +1,39 @@
+"""
+ASGI config for config project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.urls import Resolver404, resolve
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.production')
+os.environ.setdefault('DJANGO_MOVIES_ASYNC_VIEWS', 'True')
+
+django_application = get_asgi_application()
+# Django 3.1 iterates streaming responses in the event loop, where the export can't read its
+# server-side cursor: the export is served by the WSGI application in a thread
+streaming_application = WsgiToAsgi(get_wsgi_application())
+
+from movies.api.v1.views import MoviesExportApi  # noqa: E402, the apps are loaded above
+
+
+def is_streaming(path: str) -> bool:
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return False
+    return getattr(match.func, 'view_class', None) is MoviesExportApi
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and is_streaming(scope['path']):
+        return await streaming_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -92,6 +92,29 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Local memory cache is per process, file based cache (django.core.cache.backends.filebased.FileBasedCache
+# with a directory as the location) is shared by all processes of the host.
+
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.environ.get('DJANGO_CACHE_LOCATION', 'movies')
+
+CACHES = {
+    # Responses of the movies API, one per query of the list and per movie, culled when it's full
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('DJANGO_CACHE_MAX_ENTRIES', 10000))},
+    },
+    # Hit/miss counters and versions of the movies API: a few keys without timeout, culling would drop them
+    'movies_state': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': f'{CACHE_LOCATION}_state',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -141,3 +164,27 @@ MEDIA_URL = os.environ.get('DJANGO_MEDIA_URL', '/media/')
 MOVIES_SCHEMA = f'{os.environ.get("DJANGO_POSTGRES_SCHEMA_NAME", "content")}"."%s'
 
 DJANGO_ITEMS_PER_PAGE = int(os.environ.get('DJANGO_ITEMS_PER_PAGE', 50))
+
+# Total count of the movies list: 'exact', 'cached' (until the movies change) or 'estimate' (planner statistics)
+MOVIES_COUNT_STRATEGY = os.environ.get('DJANGO_MOVIES_COUNT_STRATEGY', 'exact')
+MOVIES_COUNT_CACHE_TIMEOUT = int(os.environ.get('DJANGO_MOVIES_COUNT_CACHE_TIMEOUT', 300))
+
+# Seconds the responses of the movies API are cached, 0 disables the cache
+MOVIES_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('DJANGO_MOVIES_RESPONSE_CACHE_TIMEOUT', 300))
+
+# Read the movies API from the denormalized read model (content.filmwork_read_model) instead of aggregating
+# the filmworks on every request. Fill it with `manage.py movies_read_model_rebuild` before enabling it and
+# after loads bypassing the ORM (load_data.py), admin changes refresh it by signals.
+MOVIES_READ_MODEL = os.environ.get('DJANGO_MOVIES_READ_MODEL', 'False') == 'True'
+
+# Build the JSON of the movies in Postgres and pass it to the response as it is, without Python objects
+MOVIES_JSON_FROM_DB = os.environ.get('DJANGO_MOVIES_JSON_FROM_DB', 'False') == 'True'
+
+# Movies read from the server-side cursor and sent at once by the export of the movies API
+MOVIES_EXPORT_CHUNK_SIZE = int(os.environ.get('DJANGO_MOVIES_EXPORT_CHUNK_SIZE', 2000))
+
+# Most movies requested at once by ids, /api/v1/movies/?ids=<uuid>,<uuid>,...
+MOVIES_BATCH_SIZE = int(os.environ.get('DJANGO_MOVIES_BATCH_SIZE', 100))
+
+# Serve the list and the details of the movies by async views, on by default under ASGI (config/asgi.py)
+MOVIES_ASYNC_VIEWS = os.environ.get('DJANGO_MOVIES_ASYNC_VIEWS', 'False') == 'True'
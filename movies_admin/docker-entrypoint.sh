@@ -29,4 +29,9 @@ done
 
 python manage.py migrate
 
-gunicorn -c gunicorn_conf.py config.wsgi --reload
\ No newline at end of file
+# GUNICORN_MODE=asgi serves the app by uvicorn workers sharing a cache in files, see gunicorn_asgi_conf.py
+if [ "$GUNICORN_MODE" = "asgi" ]; then
+  gunicorn -c gunicorn_asgi_conf.py config.asgi --reload
+else
+  gunicorn -c gunicorn_conf.py config.wsgi --reload
+fi
\ No newline at end of file
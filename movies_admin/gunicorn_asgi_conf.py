@@ -0,0 +1,31 @@
+import multiprocessing
+import os
+import sys
+
+# Caches of a single process: the versions of the registry of ids, the counters of the response cache
+# and the cached responses of one worker are not seen by the others
+PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+# The workers share caches in files (the movies_state one in <location>_state) unless another one is configured
+if 'DJANGO_CACHE_BACKEND' not in os.environ:
+    os.environ['DJANGO_CACHE_BACKEND'] = 'django.core.cache.backends.filebased.FileBasedCache'
+    os.environ['DJANGO_CACHE_LOCATION'] = '/tmp/movies_cache'
+
+# ASGI profile (config.asgi): every uvicorn worker serves many connections on its event loop,
+# the queries of the movies API run in threads of the loop, so workers are not multiplied for I/O
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = multiprocessing.cpu_count()
+keepalive = 5
+
+loglevel = 'error'
+errorlog = '/usr/local/var/log/gunicorn/gunicorn-error.log'
+accesslog = '/usr/local/var/log/gunicorn/gunicorn-access.log'
+
+bind = ['0.0.0.0:8000']
+
+
+def on_starting(server):
+    # Workers may come from the command line too
+    if os.environ['DJANGO_CACHE_BACKEND'] in PROCESS_CACHES and server.cfg.workers > 1:
+        sys.exit(f"{os.environ['DJANGO_CACHE_BACKEND']} is a cache of a single process, "
+                 f'{server.cfg.workers} workers need a shared one (DJANGO_CACHE_BACKEND) or -w 1')
@@ -0,0 +1,94 @@
+import hashlib
+import time
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import QueryDict
+from django.utils.http import quote_etag
+
+# Counters and versions are kept apart from the responses, see CACHES
+STATE_CACHE = 'movies_state'
+HITS_KEY = 'movies:cache:hits'
+MISSES_KEY = 'movies:cache:misses'
+# Version of the catalog and the time of its last change, kept by the triggers of the content tables
+# (migration 0005_catalog_version), so writes bypassing the ORM change them too
+CATALOG_VERSION_SQL = 'SELECT coalesce(sum("version"), 0), max("modified_at") FROM public.movies_catalog_version'
+
+
+# Versions are parts of the keys: bumping a version drops all the keys with it at once.
+# A lost version starts from the current time, so old entries are never reused.
+def get_version(key: str) -> int:
+    return caches[STATE_CACHE].get_or_set(key, time.time_ns, timeout=None)
+
+
+def bump_version(key: str):
+    state = caches[STATE_CACHE]
+    try:
+        state.incr(key)
+    except ValueError:
+        state.set(key, time.time_ns(), timeout=None)
+
+
+def _count(key: str):
+    state = caches[STATE_CACHE]
+    state.add(key, 0, timeout=None)
+    try:
+        state.incr(key)
+    except ValueError:
+        pass
+
+
+def normalize_query(query: QueryDict) -> str:
+    """Query string with sorted parameters, so the same request in any order gets the same key."""
+    return urlencode(sorted((name, value) for name, values in query.lists() for value in values))
+
+
+def catalog_version() -> Tuple[int, int]:
+    """
+    Version of the catalog and the timestamp of its last change, read from the database by every request:
+    load_data.py and the swap of its staging schema change them as well as the admin.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CATALOG_VERSION_SQL)
+        version, modified = cursor.fetchone()
+    return int(version), int(modified.timestamp()) if modified is not None else 0
+
+
+def list_key(version: int, query: QueryDict) -> str:
+    query_hash = hashlib.md5(normalize_query(query).encode()).hexdigest()
+    return f'movies:list:{version}:{query_hash}'
+
+
+def detail_key(version: int, pk) -> str:
+    return f'movies:detail:{version}:{pk}'
+
+
+def make_etag(version: int, *parts) -> str:
+    """Strong validator of a response: the catalog version and the parts identifying the response."""
+    data = ':'.join(str(part) for part in (version, *parts))
+    return quote_etag(hashlib.md5(data.encode()).hexdigest())
+
+
+def get_content(key: str) -> Optional[bytes]:
+    """Cached content of the response, hits and misses are counted."""
+    content = cache.get(key)
+    _count(MISSES_KEY if content is None else HITS_KEY)
+    return content
+
+
+def set_content(key: str, content: bytes):
+    cache.set(key, content, timeout=settings.MOVIES_RESPONSE_CACHE_TIMEOUT)
+
+
+def stats() -> dict:
+    """Hits and misses of the response cache since the start of the cache."""
+    state = caches[STATE_CACHE]
+    hits, misses = state.get(HITS_KEY, 0), state.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+    }
@@ -0,0 +1,72 @@
+import hashlib
+from typing import Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import QuerySet
+from movies.api.v1.cache import catalog_version
+
+
+def exact_count(keys: QuerySet) -> Tuple[int, bool]:
+    """COUNT(*) of the base rows, without the joins and the aggregation of the list."""
+    return keys.count(), True
+
+
+def cached_count(keys: QuerySet) -> Tuple[int, bool]:
+    """
+    Exact count kept in the cache until the catalog changes, see movies.api.v1.cache.catalog_version.
+    """
+    version, _ = catalog_version()
+    query = hashlib.md5(str(keys.query).encode()).hexdigest()
+    key = f'movies:count:{version}:{query}'
+
+    count = cache.get(key)
+    if count is None:
+        count = keys.count()
+        cache.set(key, count, timeout=settings.MOVIES_COUNT_CACHE_TIMEOUT)
+    return count, True
+
+
+def estimated_count(keys: QuerySet) -> Tuple[int, bool]:
+    """
+    Number of rows of the table estimated by the planner statistics (pg_class.reltuples),
+    it costs nothing, but it's as fresh as the last ANALYZE.
+    Filtered lists and tables never analyzed yet are counted exactly.
+    """
+    if keys.query.where:
+        return exact_count(keys)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                       [keys.model._meta.db_table.replace('"', '')])
+        row = cursor.fetchone()
+
+    if row is None or row[0] < 0:
+        return exact_count(keys)
+    return row[0], False
+
+
+COUNT_STRATEGIES = {
+    'exact': exact_count,
+    'cached': cached_count,
+    'estimate': estimated_count,
+}
+
+
+def count_movies(keys: QuerySet) -> Tuple[int, bool]:
+    """
+    Count movies with the strategy from MOVIES_COUNT_STRATEGY setting.
+    :return: count and whether it is exact.
+    """
+    return COUNT_STRATEGIES[settings.MOVIES_COUNT_STRATEGY](keys)
+
+
+class CountedPaginator(Paginator):
+    """Paginator with the count calculated in advance instead of COUNT(*) over the object list."""
+
+    def __init__(self, object_list, per_page, count: int, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        # count is a cached property of the Paginator
+        self.count = count
@@ -0,0 +1,51 @@
+from typing import Iterator, Optional, Sequence
+
+from django.db import connection
+from django.db.models import QuerySet
+
+
+def _ordering_sql(ordering: Sequence[str]) -> str:
+    fields = [f'movie."{field.lstrip("-")}"{" DESC" if field.startswith("-") else ""}' for field in ordering]
+    return f' ORDER BY {", ".join(fields)}' if fields else ''
+
+
+def rows_json(queryset: QuerySet, ordering: Sequence[str] = ()) -> str:
+    """
+    JSON array of the rows of the values queryset, built by Postgres.
+    :param ordering: fields ordering the array, json_agg doesn't keep the order of the rows.
+        They are selected for the ordering if the queryset doesn't have them.
+    """
+    fields = list(queryset.query.values_select) + list(queryset.query.annotation_select)
+    missing = [field.lstrip('-') for field in ordering if field.lstrip('-') not in fields]
+    if missing:
+        queryset = queryset.values(*fields, *missing)
+
+    document = ', '.join(f"'{field}', movie.\"{field}\"" for field in fields)
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COALESCE(json_agg(json_build_object({document}){_ordering_sql(ordering)}), '[]')::text "
+            f"FROM ({sql}) movie", params)
+        return cursor.fetchone()[0]
+
+
+def row_json(queryset: QuerySet) -> Optional[str]:
+    """JSON object of the first row of the values queryset built by Postgres, None if there are no rows."""
+    sql, params = queryset[:1].query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT row_to_json(movie)::text FROM ({sql}) movie', params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def iter_rows_json(queryset: QuerySet, chunk_size: int) -> Iterator[str]:
+    """JSON objects of the rows of the values queryset built by Postgres, read by a server-side cursor."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(f'SELECT row_to_json(movie)::text FROM ({sql}) movie', params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0]
@@ -0,0 +1,11 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Subquery, TextField
+
+
+class ArraySubquery(Subquery):
+    """
+    ARRAY(subquery): values of the single column of the correlated subquery as an array,
+    an empty array if there are none (django.contrib.postgres.expressions.ArraySubquery of Django 4.0).
+    """
+    template = 'ARRAY(%(subquery)s)'
+    output_field = ArrayField(TextField())
@@ -0,0 +1,73 @@
+import math
+
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import QuerySet
+from django.http import QueryDict
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext as _
+from movies.api.v1.registry import filmwork_types
+from movies.models import GenreFilmwork, PersonFilmwork
+
+# Language of the search vector of filmworks, see the filmwork_search_update trigger
+SEARCH_CONFIG = 'english'
+
+FILTERS = ('genre', 'type', 'person', 'rating_min', 'rating_max', 'creation_date_min', 'creation_date_max', 'q')
+
+
+def get_filters(query: QueryDict) -> dict:
+    """
+    Filters of the movies list given in the query string, e.g. ?genre=Comedy&rating_min=7&q=space+travel.
+    genre, type and person are names, q is a search in titles and descriptions in the web search syntax.
+    :raise ValueError: if a value is invalid.
+    """
+    filters = {}
+    for name in FILTERS:
+        value = query.get(name, '').strip()
+        if not value:
+            continue
+
+        if name.startswith('rating'):
+            try:
+                value = float(value)
+            except ValueError:
+                value = math.nan
+            if not math.isfinite(value):
+                raise ValueError(_('%(name)s must be a number') % {'name': name})
+        elif name.startswith('creation_date'):
+            try:
+                value = parse_date(value)
+            except ValueError:
+                value = None
+            if value is None:
+                raise ValueError(_('%(name)s must be an ISO date') % {'name': name})
+
+        filters[name] = value
+    return filters
+
+
+def filter_movies(queryset: QuerySet, filters: dict) -> QuerySet:
+    """
+    Filmworks matching all the filters, every filter is backed by an index, see movies_filters_plan.
+    :param queryset: queryset of filmworks.
+    """
+    if 'genre' in filters:
+        genres = GenreFilmwork.objects.filter(genre__name=filters['genre'])
+        queryset = queryset.filter(id__in=genres.values('filmwork_id'))
+    if 'person' in filters:
+        persons = PersonFilmwork.objects.filter(person__full_name=filters['person'])
+        queryset = queryset.filter(id__in=persons.values('filmwork_id'))
+    if 'type' in filters:
+        # The id of the type from the registry, without a join of the types
+        type_id = filmwork_types.get_id(filters['type'])
+        queryset = queryset.filter(type_id=type_id) if type_id is not None else queryset.none()
+    if 'rating_min' in filters:
+        queryset = queryset.filter(rating__gte=filters['rating_min'])
+    if 'rating_max' in filters:
+        queryset = queryset.filter(rating__lte=filters['rating_max'])
+    if 'creation_date_min' in filters:
+        queryset = queryset.filter(creation_date__gte=filters['creation_date_min'])
+    if 'creation_date_max' in filters:
+        queryset = queryset.filter(creation_date__lte=filters['creation_date_max'])
+    if 'q' in filters:
+        queryset = queryset.filter(search=SearchQuery(filters['q'], config=SEARCH_CONFIG, search_type='websearch'))
+    return queryset
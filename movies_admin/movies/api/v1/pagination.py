@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+import uuid
+
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.translation import gettext_lazy as _
+
+
+class CursorPaginator:
+    """
+    Keyset (seek) pagination of movies ordered by (title, id).
+    The ids of a page are found with the filmwork (title, id) index starting from the key
+    of the last (or the first) movie of the neighbour page, then only these movies are aggregated,
+    so the latency of a page doesn't depend on its depth, unlike OFFSET of the Paginator.
+
+    """
+    NEXT = 'next'
+    PREV = 'prev'
+
+    def __init__(self, keys: QuerySet, queryset: QuerySet, per_page: int):
+        """
+        :param keys: queryset of movies the page is searched in.
+        :param queryset: queryset of values of the movies, it is filtered by the ids of the page.
+        :param per_page: number of movies on a page.
+        """
+        self.keys = keys
+        self.queryset = queryset
+        self.per_page = per_page
+
+    @staticmethod
+    def encode(direction: str, movie: dict) -> str:
+        """Opaque cursor pointing to the movie: the page goes after the movie or before it."""
+        data = json.dumps([direction, movie['title'], str(movie['id'])])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> tuple:
+        """
+        :return: direction, title and id of the movie of the cursor.
+        :raise Http404: if the cursor is broken.
+        """
+        try:
+            direction, title, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if direction not in (cls.NEXT, cls.PREV) or not isinstance(title, str) or not isinstance(pk, str):
+                raise ValueError(direction)
+            return direction, title, uuid.UUID(pk)
+        except (binascii.Error, TypeError, ValueError):
+            raise Http404(_('Invalid cursor'))
+
+    def get_page(self, cursor: str) -> dict:
+        """
+        Page of movies after (or before) the cursor, the first page for an empty cursor.
+        :return: dict with cursors of the neighbour pages and results, the queryset of the movies of the page.
+        """
+        direction, title, pk = self.decode(cursor) if cursor else (self.NEXT, None, None)
+        keys = self.keys
+
+        if direction == self.NEXT:
+            ordering = ('title', 'id')
+            if title is not None:
+                keys = keys.filter(Q(title__gte=title) & (Q(title__gt=title) | Q(id__gt=pk)))
+        else:
+            ordering = ('-title', '-id')
+            keys = keys.filter(Q(title__lte=title) & (Q(title__lt=title) | Q(id__lt=pk)))
+
+        # One extra key tells whether there is a page further in the direction
+        rows = list(keys.order_by(*ordering).values('id', 'title')[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        # Keys of the page in the order of the results, the database collation decides it
+        page = rows[:self.per_page] if direction == self.NEXT else rows[self.per_page - 1::-1]
+        results = self.queryset.filter(id__in=[row['id'] for row in page]).order_by('title', 'id')
+
+        # The movie of the cursor itself is on the page we came from
+        has_next, has_prev = (has_more, title is not None) if direction == self.NEXT else (True, has_more)
+
+        return {
+            'prev': self.encode(self.PREV, page[0]) if has_prev and page else None,
+            'next': self.encode(self.NEXT, page[-1]) if has_next and page else None,
+            'results': results,
+        }
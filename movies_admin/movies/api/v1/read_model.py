@@ -0,0 +1,50 @@
+from typing import Iterable, Optional, Sequence
+
+from django.db import connection
+from movies.models import Filmwork, FilmworkReadModel
+
+# Fields of the movies in the responses of the API, in the order of the aggregation query
+FIELDS = ('id', 'title', 'description', 'creation_date', 'rating',
+          'type', 'genres', 'actors', 'writers', 'directors')
+# Names of the related genres and persons, the most expensive fields
+RELATIONS = ('genres', 'actors', 'writers', 'directors')
+
+
+def refresh(ids: Optional[Iterable] = None):
+    """
+    Write rows of the read model from the aggregation query of the API, so both give the same movies.
+    Runs in the transaction of the change, rows of deleted filmworks are deleted.
+    :param ids: ids of the filmworks to refresh, None refreshes all of them.
+    """
+    # Imported here: the views import this module
+    from movies.api.v1.views import MoviesApiMixin
+
+    queryset = MoviesApiMixin.get_movies_queryset()
+    if ids is not None:
+        ids = list(set(ids))
+        if not ids:
+            return
+        queryset = queryset.filter(id__in=ids)
+
+    sql, params = queryset.query.sql_with_params()
+    columns = queryset.query.values_select + tuple(queryset.query.annotation_select)
+    table = FilmworkReadModel._meta.db_table
+    names = ', '.join(f'"{column}"' for column in columns)
+    updates = ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in columns if column != 'id')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO "{table}" ({names}) {sql} '
+            f'ON CONFLICT (id) DO UPDATE SET {updates}',
+            params)
+
+        stale = f'DELETE FROM "{table}" r WHERE NOT EXISTS (SELECT 1 FROM "{Filmwork._meta.db_table}" f WHERE f.id = r.id)'
+        if ids is None:
+            cursor.execute(stale)
+        else:
+            cursor.execute(f'{stale} AND r.id = ANY(%s::uuid[])', [ids])
+
+
+def queryset(fields: Sequence[str] = FIELDS):
+    """Values of the movies from the read model, without joins and aggregation."""
+    return FilmworkReadModel.objects.values(*fields)
@@ -0,0 +1,50 @@
+import threading
+from typing import Dict, Optional
+
+from django.db import connection
+from django.db.models import Model
+from movies.api.v1.cache import bump_version, get_version
+from movies.models import Career, FilmworkType
+
+
+class IdRegistry:
+    """
+    Ids of the rows of a small dictionary table (careers, types of filmworks) by their names.
+    Read from the database on the first use and kept by the process until the table changes:
+    the signals of the model bump the version in the cache, so every process reloads them.
+    Rows written bypassing the ORM (load_data.py) send no signals: a missing name is read again.
+    """
+
+    def __init__(self, model: Model):
+        self.model = model
+        self.version_key = f'movies:registry:{model._meta.model_name}:version'
+        self._ids = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_ids(self, reload: bool = False) -> Dict[str, object]:
+        version = get_version(self.version_key)
+        with self._lock:
+            if not reload and self._ids is not None and self._version == version:
+                return self._ids
+
+            ids = dict(self.model.objects.values_list('name', 'id'))
+            # Rows read in a transaction may be rolled back, only committed ones are kept
+            if not connection.in_atomic_block:
+                self._ids, self._version = ids, version
+            return ids
+
+    def get_id(self, name: str) -> Optional[object]:
+        """Id of the row with the name, None if there is no such row."""
+        ids = self.get_ids()
+        if name not in ids:
+            ids = self.get_ids(reload=True)
+        return ids.get(name)
+
+    def clear(self):
+        """Forget the ids in all processes, called on every change of the table."""
+        bump_version(self.version_key)
+
+
+careers = IdRegistry(Career)
+filmwork_types = IdRegistry(FilmworkType)
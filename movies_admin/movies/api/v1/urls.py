@@ -1,8 +1,15 @@
 from movies.api.v1 import views
+from django.conf import settings
 from django.urls import path
 
+# Async views run the queries in threads of the event loop of the ASGI server, see config/asgi.py
+if settings.MOVIES_ASYNC_VIEWS:
+    list_view, detail_view = views.AsyncMoviesListApi, views.AsyncMoviesDetailApi
+else:
+    list_view, detail_view = views.MoviesListApi, views.MoviesDetailApi
 
 urlpatterns = [
-    path('movies/', views.MoviesListApi.as_view()),
-    path('movies/<uuid:pk>', views.MoviesDetailApi.as_view()),
+    path('movies/', list_view.as_view()),
+    path('movies/export', views.MoviesExportApi.as_view()),
+    path('movies/<uuid:pk>', detail_view.as_view()),
 ]
@@ -1,32 +1,77 @@
+import datetime
+import functools
+import json
 import logging
+import uuid
+from typing import Iterator, List, Optional
 
-import django.db.utils
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.db.models import F, Q
-from django.http import JsonResponse
+from django.contrib.postgres.fields import ArrayField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import F, OuterRef, Q, QuerySet, TextField, Value
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+from django.utils.translation import gettext as _
 from django.views.generic.detail import BaseDetailView
 from django.views.generic.list import BaseListView
-from movies.models import Career, CareerNameEnum, Filmwork
+from movies.api.v1 import cache as response_cache
+from movies.api.v1 import db_json
+from movies.api.v1 import read_model
+from movies.api.v1.counts import CountedPaginator, count_movies
+from movies.api.v1.expressions import ArraySubquery
+from movies.api.v1.filters import filter_movies, get_filters
+from movies.api.v1.pagination import CursorPaginator
+from movies.api.v1.registry import careers
+from movies.models import (CareerNameEnum, Filmwork, FilmworkReadModel,
+                           GenreFilmwork, PersonFilmwork)
 
 logger = logging.getLogger()
 
 
+def genres_names() -> ArraySubquery:
+    """Sorted distinct names of the genres of the filmwork of the outer query."""
+    genres = GenreFilmwork.objects.filter(filmwork=OuterRef('pk')).values('genre__name')
+    # DISTINCT ON the ordered field: ordering of subqueries with a plain DISTINCT is dropped by Django
+    return ArraySubquery(genres.distinct('genre__name').order_by('genre__name'))
+
+
+def persons_names(career: CareerNameEnum):
+    """
+    Sorted distinct names of the persons of the filmwork of the outer query in the career.
+    Without the career in the table it's an empty array, instead of persons of all careers.
+    """
+    career_id = careers.get_id(career.value)
+    if career_id is None:
+        logger.error('Career %s does not exist', career.value)
+        return Value([], output_field=ArrayField(TextField()))
+    persons = PersonFilmwork.objects.filter(role=career_id, filmwork=OuterRef('pk')).values('person__full_name')
+    return ArraySubquery(persons.distinct('person__full_name').order_by('person__full_name'))
+
+
+def changed_movies(since: datetime.datetime) -> QuerySet:
+    """
+    Ids of the filmworks changed since the time: the filmwork, its type, its links, genres or persons.
+    Deleted links leave no trace, consumers need a full export to see them.
+    """
+    # IN subqueries are hashed once by Postgres, unlike EXISTS correlated with every filmwork
+    genres = GenreFilmwork.objects.filter(
+        Q(created_at__gte=since) | Q(genre__updated_at__gte=since)).values('filmwork_id')
+    persons = PersonFilmwork.objects.filter(
+        Q(created_at__gte=since) | Q(person__updated_at__gte=since)).values('filmwork_id')
+    return Filmwork.objects.filter(
+        Q(updated_at__gte=since) | Q(type__updated_at__gte=since) | Q(id__in=genres) | Q(id__in=persons)
+    ).values('id')
+
+
 class MoviesApiMixin:
     model = Filmwork
     http_method_names = ['get']  # Список методов, которые реализует обработчик
     
-    actor = writer = director = None
-    try:
-        actor = Q(personfilmwork__role=Career.get_career_id(
-            CareerNameEnum.ACTOR))
-        writer = Q(personfilmwork__role=Career.get_career_id(
-            CareerNameEnum.WRITER))
-        director = Q(personfilmwork__role=Career.get_career_id(
-            CareerNameEnum.DIRECTOR))
-    except (django.db.utils.ProgrammingError, Career.DoesNotExist) as error:
-        logger.error(error)
-
     selected_fields = (
                         'id',
                         'title',
@@ -35,13 +80,122 @@ class MoviesApiMixin:
                         'rating',
                         )
 
-    queryset = Filmwork.objects.values(*selected_fields).annotate(
-        type=F('type__name'),
-        genres=ArrayAgg('genres__name', distinct=True),
-        actors=ArrayAgg('persons__full_name', filter=actor, distinct=True),
-        writers=ArrayAgg('persons__full_name', filter=writer, distinct=True),
-        directors=ArrayAgg('persons__full_name', filter=director, distinct=True),
-        )
+    @classmethod
+    def get_annotations(cls) -> dict:
+        """
+        Every array is aggregated by its own subquery, so genres and persons of the filmwork
+        are not joined into genres × persons rows grouped back by the filmwork.
+        Roles come from the registry of careers on use, not from the database at import.
+        """
+        return {
+            'type': F('type__name'),
+            'genres': genres_names(),
+            'actors': persons_names(CareerNameEnum.ACTOR),
+            'writers': persons_names(CareerNameEnum.WRITER),
+            'directors': persons_names(CareerNameEnum.DIRECTOR),
+        }
+
+    @classmethod
+    def get_movies_queryset(cls, fields: tuple = read_model.FIELDS) -> QuerySet:
+        """Values of the movies aggregated from the filmworks, only the names of the fields are aggregated."""
+        annotations = cls.get_annotations()
+        return Filmwork.objects.values(
+            *(field for field in fields if field in cls.selected_fields)
+        ).annotate(**{field: annotations[field] for field in fields if field in annotations})
+
+    # Fields of the movies in the response, see get_fields
+    fields = read_model.FIELDS
+    # Version of the catalog read by the request, see get
+    version = None
+
+    def get_fields(self) -> tuple:
+        """
+        Fields requested by ?fields= and ?include= (comma separated, e.g. ?fields=title,rating&include=genres),
+        id is always there. Without ?fields= all the fields except relations are there, relations are
+        included only if requested, all fields without both parameters.
+        :raise ValueError: if a field is unknown.
+        """
+        query = self.request.GET
+        if 'fields' not in query and 'include' not in query:
+            return read_model.FIELDS
+
+        requested = {'id'}
+        if 'fields' not in query:
+            requested.update(field for field in read_model.FIELDS if field not in read_model.RELATIONS)
+        for parameter in ('fields', 'include'):
+            for value in query.getlist(parameter):
+                requested.update(field.strip() for field in value.split(',') if field.strip())
+
+        unknown = requested.difference(read_model.FIELDS)
+        if unknown:
+            raise ValueError(_('Unknown fields: %(unknown)s, fields are: %(fields)s') % {
+                'unknown': ', '.join(sorted(unknown)), 'fields': ', '.join(read_model.FIELDS)})
+        return tuple(field for field in read_model.FIELDS if field in requested)
+
+    def get_queryset(self):
+        # The read model has the names aggregated in advance, see MOVIES_READ_MODEL
+        if settings.MOVIES_READ_MODEL:
+            self.queryset = read_model.queryset(self.fields)
+        else:
+            # Only the requested names are aggregated, without them the filmwork is read alone
+            self.queryset = self.get_movies_queryset(self.fields)
+        return super().get_queryset()
+
+    def get_cache_key(self) -> Optional[str]:
+        """Key of the response in the cache, None for responses not cached, the default."""
+        return None
+
+    def get_etag(self) -> str:
+        """Validator of the response: the catalog version, the path and the query of the request."""
+        return response_cache.make_etag(self.version, self.request.path,
+                                        response_cache.normalize_query(self.request.GET))
+
+    def get(self, request, *args, **kwargs):
+        """
+        Conditional GET: the validators come from the catalog version and the time of the last change
+        (see movies.api.v1.cache), so 304 is answered before the cache and the aggregation query.
+        Last-Modified has a precision of a second, clients should prefer the ETag.
+        """
+        try:
+            self.fields = self.get_fields()
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+        # Read once: the validators and the cache key of the response are of the same version
+        self.version, modified = response_cache.catalog_version()
+        etag = self.get_etag()
+
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is None:
+            response = self.get_cached(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+            # Clients keep the response, but revalidate it on every request
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def get_cached(self, request, *args, **kwargs):
+        """Serve the response from the cache, see movies.api.v1.cache, MOVIES_RESPONSE_CACHE_TIMEOUT = 0 disables it."""
+        if not settings.MOVIES_RESPONSE_CACHE_TIMEOUT:
+            return super().get(request, *args, **kwargs)
+
+        key = self.get_cache_key()
+        if key is None:
+            return super().get(request, *args, **kwargs)
+
+        content = response_cache.get_content(key)
+        if content is not None:
+            response = HttpResponse(content, content_type='application/json')
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response_cache.set_content(key, response.content)
+        response['X-Cache'] = 'MISS'
+        return response
 
     def render_to_response(self, context, **response_kwargs):
         return JsonResponse(context)
@@ -49,17 +203,94 @@ class MoviesApiMixin:
 
 class MoviesListApi(MoviesApiMixin, BaseListView):
     paginate_by = settings.DJANGO_ITEMS_PER_PAGE
-    ordering = 'title'
+    # id makes the order of movies with the same title stable between pages, as for the cursors
+    ordering = ('title', 'id')
+    count_exact = True
+    # Ids of the movies requested at once, see get_ids
+    ids = None
+    # Filters of the list, see movies.api.v1.filters
+    filters = {}
+
+    def get(self, request, *args, **kwargs):
+        try:
+            self.ids = self.get_ids()
+            self.filters = get_filters(request.GET)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return super().get(request, *args, **kwargs)
+
+    def get_ids(self) -> Optional[List[uuid.UUID]]:
+        """
+        Ids of the movies requested by ?ids= (comma separated) instead of a page, without repeats,
+        in the order of the request, up to MOVIES_BATCH_SIZE of them.
+        :raise ValueError: if an id is invalid or there are too many of them.
+        """
+        if 'ids' not in self.request.GET:
+            return None
+
+        ids = {}
+        for value in self.request.GET.getlist('ids'):
+            for pk in filter(None, (pk.strip() for pk in value.split(','))):
+                try:
+                    ids.setdefault(uuid.UUID(pk))
+                except ValueError:
+                    raise ValueError(_('Invalid id: %(id)s') % {'id': pk})
+
+        if len(ids) > settings.MOVIES_BATCH_SIZE:
+            raise ValueError(_('Too many ids: %(count)d, at most %(limit)d') % {
+                'count': len(ids), 'limit': settings.MOVIES_BATCH_SIZE})
+        return list(ids)
+
+    def get_cache_key(self) -> str:
+        return response_cache.list_key(self.version, self.request.GET)
+
+    def get_etag(self) -> str:
+        return response_cache.make_etag(self.version, 'list', response_cache.normalize_query(self.request.GET))
+
+    def get_keys_queryset(self):
+        """
+        Movies of the list without the joins and the aggregation, they are counted and paginated by cursors.
+        Filters are applied to filmworks, they have the indexes.
+        """
+        if not settings.MOVIES_READ_MODEL:
+            return filter_movies(self.model.objects.all(), self.filters)
+        keys = FilmworkReadModel.objects.all()
+        if self.filters:
+            keys = keys.filter(id__in=filter_movies(self.model.objects.all(), self.filters).values('id'))
+        return keys
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        count, self.count_exact = count_movies(self.get_keys_queryset())
+        return CountedPaginator(queryset, per_page, count, orphans=orphans,
+                                allow_empty_first_page=allow_empty_first_page, **kwargs)
 
     def get_context_data(self, *, object_list=None, **kwargs):
         queryset = object_list if object_list is not None else self.object_list
         page_size = self.get_paginate_by(queryset)
 
+        # Movies requested by ids are found by one query and returned in the order of the ids
+        if self.ids is not None:
+            movies = {movie['id']: movie for movie in queryset.filter(id__in=self.ids)}
+            return {
+                'results': [movies[pk] for pk in self.ids if pk in movies],
+                'missing': [pk for pk in self.ids if pk not in movies],
+            }
+
+        # Opt-in keyset pagination: ?cursor= for the first page, then cursors from the response
+        if 'cursor' in self.request.GET:
+            paginator = CursorPaginator(self.get_keys_queryset(), queryset, page_size)
+            return paginator.get_page(self.request.GET['cursor'])
+
         if page_size:
-            paginator, page, queryset, _ = self.paginate_queryset(
-                queryset, page_size)
+            # The page is found by the ids only, so the names are aggregated for the movies of the page
+            # and not for all the movies skipped by the offset
+            keys = self.get_keys_queryset().order_by(*self.ordering).values_list('id', flat=True)
+            paginator, page, ids, _ = self.paginate_queryset(
+                keys, page_size)
+            queryset = queryset.filter(id__in=ids).order_by(*self.ordering)
             context = {
                 'count': paginator.count,
+                'count_exact': self.count_exact,
                 'total_pages': paginator.num_pages,
                 'prev': page.previous_page_number() if page.has_previous() else None,
                 'next': page.next_page_number() if page.has_next() else None,
@@ -69,13 +300,154 @@ class MoviesListApi(MoviesApiMixin, BaseListView):
         return context
 
     def render_to_response(self, context, **response_kwargs):
+        # Movies requested by ids are already ordered in Python and there are few of them
+        if settings.MOVIES_JSON_FROM_DB and self.ids is None:
+            return self.render_db_json(context)
         context['results'] = list(context['results'])
         return JsonResponse(context)
 
+    def render_db_json(self, context):
+        """Results are serialized by Postgres, their JSON is put into the JSON of the page as it is."""
+        results = db_json.rows_json(context.pop('results'), self.ordering)
+        page = json.dumps(context, cls=DjangoJSONEncoder)
+        separator = ', ' if context else ''
+        return HttpResponse(f'{page[:-1]}{separator}"results": {results}}}', content_type='application/json')
+
 
 class MoviesDetailApi(MoviesApiMixin, BaseDetailView):
     # pk_url_kwarg = 'uuid'
+    def get_cache_key(self) -> Optional[str]:
+        # Only the full movie is cached, its key changes with the catalog version
+        if self.fields != read_model.FIELDS:
+            return None
+        return response_cache.detail_key(self.version, self.kwargs[self.pk_url_kwarg])
+
+    def get_etag(self) -> str:
+        return response_cache.make_etag(self.version, 'detail', self.kwargs[self.pk_url_kwarg], ','.join(self.fields))
+
+    def get_object(self, queryset=None):
+        """The movie, or the JSON of the movie built by Postgres with MOVIES_JSON_FROM_DB."""
+        if not settings.MOVIES_JSON_FROM_DB:
+            return super().get_object(queryset)
+
+        queryset = queryset if queryset is not None else self.get_queryset()
+        content = db_json.row_json(queryset.filter(pk=self.kwargs[self.pk_url_kwarg]))
+        if content is None:
+            raise Http404(_('No %(verbose_name)s found matching the query') %
+                          {'verbose_name': queryset.model._meta.verbose_name})
+        return content
+
     def get_context_data(self, **kwargs):
         return self.object
-    
 
+    def render_to_response(self, context, **response_kwargs):
+        if settings.MOVIES_JSON_FROM_DB:
+            return HttpResponse(context, content_type='application/json')
+        return super().render_to_response(context, **response_kwargs)
+
+
+class AsyncMoviesApiMixin:
+    """
+    Async handler of the movies API for the ASGI deployment, see config/asgi.py and MOVIES_ASYNC_VIEWS.
+    The ORM is synchronous: the sync handler runs in a thread of the event loop executor, while the loop
+    keeps accepting connections and sending responses to slow clients without holding a thread.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Django 3.1 awaits only views that are coroutine functions, the view of a class is not one
+        view = super().as_view(**initkwargs)
+
+        @functools.wraps(view)
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return async_view
+
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(self.get_in_thread, thread_sensitive=False)(request, *args, **kwargs)
+
+    def get_in_thread(self, request, *args, **kwargs):
+        # Connections belong to the threads of the executor, they are closed or reused as after
+        # a request of the WSGI server, see CONN_MAX_AGE
+        close_old_connections()
+        try:
+            return super().get(request, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        # Handlers of an async view are awaited, the sync one of View returns the response itself
+        return super().http_method_not_allowed(request, *args, **kwargs)
+
+
+class AsyncMoviesListApi(AsyncMoviesApiMixin, MoviesListApi):
+    pass
+
+
+class AsyncMoviesDetailApi(AsyncMoviesApiMixin, MoviesDetailApi):
+    pass
+
+
+class MoviesExportApi(MoviesApiMixin, BaseListView):
+    """
+    All movies as newline delimited JSON, one movie per line. Movies are read from a server-side cursor
+    and sent in chunks of MOVIES_EXPORT_CHUNK_SIZE, so the memory of the worker doesn't grow with the catalog.
+    ?updated_since= (ISO date or date and time) exports only the movies changed since then, see changed_movies.
+    """
+    ordering = 'id'
+    updated_since = None
+
+    def get(self, request, *args, **kwargs):
+        value = request.GET.get('updated_since')
+        if value:
+            self.updated_since = self.parse_updated_since(value)
+            if self.updated_since is None:
+                return JsonResponse({'error': _('updated_since must be an ISO date or date and time')}, status=400)
+        return super().get(request, *args, **kwargs)
+
+    @staticmethod
+    def parse_updated_since(value: str) -> Optional[datetime.datetime]:
+        """
+        :return: aware time of the date and time or of the start of the date, None if the value is invalid.
+        """
+        try:
+            since = parse_datetime(value)
+            if since is None:
+                date = parse_date(value)
+                since = date and datetime.datetime.combine(date, datetime.time())
+        except ValueError:
+            return None
+        if since is not None and timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.updated_since is not None:
+            queryset = queryset.filter(id__in=changed_movies(self.updated_since))
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        return {'movies': self.object_list}
+
+    def render_to_response(self, context, **response_kwargs):
+        return StreamingHttpResponse(self.iter_chunks(context['movies']), content_type='application/x-ndjson')
+
+    @staticmethod
+    def iter_chunks(queryset: QuerySet) -> Iterator[str]:
+        """Lines of the movies joined by chunks of the cursor."""
+        chunk_size = settings.MOVIES_EXPORT_CHUNK_SIZE
+        if settings.MOVIES_JSON_FROM_DB:
+            rows = db_json.iter_rows_json(queryset, chunk_size)
+        else:
+            rows = (json.dumps(movie, cls=DjangoJSONEncoder) for movie in queryset.iterator(chunk_size=chunk_size))
+
+        lines = []
+        for row in rows:
+            lines.append(f'{row}\n')
+            if len(lines) == chunk_size:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
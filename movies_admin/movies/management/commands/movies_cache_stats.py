@@ -0,0 +1,24 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from movies.api.v1 import cache as response_cache
+
+# Caches of the process itself: the counters of the serving processes are not seen by the command
+PROCESS_CACHES = (LocMemCache, DummyCache)
+
+
+class Command(BaseCommand):
+    help = ('Show hits and misses of the response cache of the movies API, counted by all the serving processes '
+            'in a shared cache (DJANGO_CACHE_BACKEND)')
+
+    def handle(self, *args, **options):
+        cache = caches[response_cache.STATE_CACHE]
+        if isinstance(cache, PROCESS_CACHES):
+            raise CommandError(
+                f'{type(cache).__name__} is a cache of a single process, the counters of the server are not seen '
+                'here: set DJANGO_CACHE_BACKEND to a shared cache, '
+                'e.g. django.core.cache.backends.filebased.FileBasedCache')
+
+        stats = response_cache.stats()
+        self.stdout.write(f"hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {stats['hit_ratio']:.2%}")
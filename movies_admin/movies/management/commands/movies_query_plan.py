@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from movies.api.v1.views import MoviesApiMixin
+from movies.management.plans import explain, plan_nodes
+from movies.models import Filmwork, GenreFilmwork, PersonFilmwork
+
+# The filmwork with the largest genres × persons product, the worst case of a join of both
+WORST_FILMWORK_SQL = f'''
+SELECT g.filmwork_id
+FROM "{GenreFilmwork._meta.db_table}" g
+JOIN "{PersonFilmwork._meta.db_table}" p ON p.filmwork_id = g.filmwork_id
+GROUP BY g.filmwork_id
+ORDER BY count(*) DESC
+LIMIT 1
+'''
+
+
+class Command(BaseCommand):
+    help = ('Explain the movie query of the API and check that intermediate rows '
+            'do not multiply genres by persons of the movie')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--id', help='id of the filmwork, the one with most genres × persons by default')
+        parser.add_argument('--plan', action='store_true', help='print the plan')
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            pk = options['id']
+            if pk is None:
+                cursor.execute(WORST_FILMWORK_SQL)
+                row = cursor.fetchone()
+                if row is None:
+                    raise CommandError('no filmworks with both genres and persons')
+                pk = row[0]
+
+            sql, params = MoviesApiMixin.get_movies_queryset().filter(pk=pk).query.sql_with_params()
+            plan = explain(cursor, sql, params, analyze=True)
+
+        genres = GenreFilmwork.objects.filter(filmwork=pk).count()
+        persons = PersonFilmwork.objects.filter(filmwork=pk).count()
+
+        # Rows of scans are rows of the tables, joins, sorts and aggregates show the intermediate rows
+        intermediate = [node for node in plan_nodes(plan) if not node['Node Type'].endswith('Scan')]
+        largest = max(intermediate, key=lambda node: node['Actual Rows'], default=None)
+        rows = largest['Actual Rows'] if largest else 0
+
+        if options['plan']:
+            self.stdout.write(json.dumps(plan, indent=2))
+        self.stdout.write(f'filmwork {pk} ({Filmwork.objects.get(pk=pk).title}): {genres} genres, {persons} persons')
+        if largest:
+            self.stdout.write(f"largest intermediate node: {largest['Node Type']}, {rows} rows per loop")
+
+        if rows > max(genres, persons, 1):
+            raise CommandError(f'intermediate rows multiply: {rows} rows for {genres} genres and {persons} persons')
+        self.stdout.write(self.style.SUCCESS('no genres × persons rows'))
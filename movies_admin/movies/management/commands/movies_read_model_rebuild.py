@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from movies.api.v1 import read_model
+from movies.models import FilmworkReadModel
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the read model of the movies API from the filmworks, e.g. after load_data.py'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            read_model.refresh()
+        count = FilmworkReadModel.objects.count()
+        self.stdout.write(f'{count} movies in the read model, {time.perf_counter() - start:.2f} s')
@@ -0,0 +1,16 @@
+import json
+
+
+def explain(cursor, sql: str, params, analyze: bool = False) -> dict:
+    """Root node of the plan of the query, EXPLAIN (FORMAT JSON) with ANALYZE if asked."""
+    options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+    cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+    result = cursor.fetchone()[0]
+    return (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+
+
+def plan_nodes(plan: dict):
+    """The node and all the nodes under it, depth first."""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0001_initial'),
+    ]
+
+    operations = [migrations.RunSQL(
+        sql="""
+        --
+        -- Index for the keyset pagination of movies by (title, id)
+        --
+        CREATE INDEX IF NOT EXISTS "filmwork_title_id_idx" ON "content"."filmwork" ("title", "id");
+        """,
+        reverse_sql="""
+        DROP INDEX IF EXISTS "content"."filmwork_title_id_idx";
+        """
+    )
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_filmwork_title_id_index'),
+    ]
+
+    operations = [migrations.RunSQL(
+        sql="""
+        --
+        -- Denormalized read model of the movies API, filled by the movies_read_model_rebuild command
+        --
+        CREATE TABLE IF NOT EXISTS "content"."filmwork_read_model" (
+            "id" uuid NOT NULL PRIMARY KEY,
+            "title" text NOT NULL,
+            "description" text NOT NULL,
+            "creation_date" date NULL,
+            "rating" double precision NULL,
+            "type" text NULL,
+            "genres" text[] NULL,
+            "actors" text[] NULL,
+            "writers" text[] NULL,
+            "directors" text[] NULL
+            );
+        CREATE INDEX IF NOT EXISTS "filmwork_read_model_title_id_idx" ON "content"."filmwork_read_model" ("title", "id");
+        """,
+        reverse_sql="""
+        DROP TABLE IF EXISTS "content"."filmwork_read_model";
+        """
+    )
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_filmwork_read_model'),
+    ]
+
+    operations = [migrations.RunSQL(
+        sql="""
+        --
+        -- Full-text search vector of the filmwork kept by a trigger, the function is outside of the content
+        -- schema, so the staging schema of load_data.py --staging uses it too
+        --
+        ALTER TABLE "content"."filmwork" ADD COLUMN IF NOT EXISTS "search" tsvector NULL;
+        CREATE OR REPLACE FUNCTION public.filmwork_search_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search := setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+                          setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS "filmwork_search_update" ON "content"."filmwork";
+        CREATE TRIGGER "filmwork_search_update" BEFORE INSERT OR UPDATE OF "title", "description"
+            ON "content"."filmwork" FOR EACH ROW EXECUTE FUNCTION public.filmwork_search_update();
+        UPDATE "content"."filmwork" SET "title" = "title";
+        --
+        -- Indexes of the filters of the movies list
+        --
+        CREATE INDEX IF NOT EXISTS "filmwork_search_idx" ON "content"."filmwork" USING gin ("search");
+        CREATE INDEX IF NOT EXISTS "filmwork_rating_idx" ON "content"."filmwork" ("rating");
+        CREATE INDEX IF NOT EXISTS "filmwork_creation_date_idx" ON "content"."filmwork" ("creation_date");
+        CREATE INDEX IF NOT EXISTS "filmwork_type_id_idx" ON "content"."filmwork" ("type_id");
+        CREATE INDEX IF NOT EXISTS "genres_filmworks_genre_id_idx" ON "content"."genres_filmworks" ("genre_id");
+        CREATE INDEX IF NOT EXISTS "person_full_name_idx" ON "content"."person" ("full_name");
+        """,
+        reverse_sql="""
+        DROP INDEX IF EXISTS "content"."person_full_name_idx";
+        DROP INDEX IF EXISTS "content"."genres_filmworks_genre_id_idx";
+        DROP INDEX IF EXISTS "content"."filmwork_type_id_idx";
+        DROP INDEX IF EXISTS "content"."filmwork_creation_date_idx";
+        DROP INDEX IF EXISTS "content"."filmwork_rating_idx";
+        DROP INDEX IF EXISTS "content"."filmwork_search_idx";
+        DROP TRIGGER IF EXISTS "filmwork_search_update" ON "content"."filmwork";
+        DROP FUNCTION IF EXISTS public.filmwork_search_update();
+        ALTER TABLE "content"."filmwork" DROP COLUMN IF EXISTS "search";
+        """
+    )
+    ]
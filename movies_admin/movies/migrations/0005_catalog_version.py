@@ -0,0 +1,57 @@
+from django.db import migrations
+
+TABLES = ('filmwork', 'filmwork_type', 'genre', 'genres_filmworks', 'person', 'career', 'persons_filmworks',
+          'filmwork_read_model')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_filmwork_search_filters'),
+    ]
+
+    operations = [migrations.RunSQL(
+        sql="""
+        --
+        -- Version of the catalog, the validators and the cache keys of the movies API are made of it.
+        -- It's kept by triggers, so writes bypassing the ORM (load_data.py) change it too. A transaction
+        -- bumps the row of the slot of its connection once: parallel writers rarely wait for each other.
+        -- The version is the sum of the rows, the time of the last change is the max of them.
+        -- Functions are outside of the content schema, so the staging schema of load_data.py --staging uses them too
+        --
+        CREATE TABLE IF NOT EXISTS public.movies_catalog_version (
+            "slot" integer NOT NULL PRIMARY KEY,
+            "version" bigint NOT NULL DEFAULT 0,
+            "modified_at" timestamp with time zone NOT NULL DEFAULT now()
+        );
+        INSERT INTO public.movies_catalog_version ("slot") SELECT generate_series(0, 63) ON CONFLICT DO NOTHING;
+        CREATE OR REPLACE FUNCTION public.movies_catalog_touch() RETURNS void AS $$
+        BEGIN
+            IF current_setting('movies.catalog_touched', true) IS DISTINCT FROM 'on' THEN
+                UPDATE public.movies_catalog_version
+                SET "version" = "version" + 1, "modified_at" = clock_timestamp()
+                WHERE "slot" = pg_backend_pid() % 64;
+                PERFORM set_config('movies.catalog_touched', 'on', true);
+            END IF;
+        END
+        $$ LANGUAGE plpgsql;
+        CREATE OR REPLACE FUNCTION public.movies_catalog_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM public.movies_catalog_touch();
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """ + ''.join(f"""
+        DROP TRIGGER IF EXISTS "{table}_catalog_changed" ON "content"."{table}";
+        CREATE TRIGGER "{table}_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON "content"."{table}" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+        """ for table in TABLES),
+        reverse_sql=''.join(f"""
+        DROP TRIGGER IF EXISTS "{table}_catalog_changed" ON "content"."{table}";
+        """ for table in TABLES) + """
+        DROP FUNCTION IF EXISTS public.movies_catalog_changed();
+        DROP FUNCTION IF EXISTS public.movies_catalog_touch();
+        DROP TABLE IF EXISTS public.movies_catalog_version;
+        """
+    )
+    ]
@@ -3,3 +3,4 @@ from .filmwork import (Filmwork, FilmworkType, GenreFilmwork, Movie,
                        PersonFilmwork, TVSeries)
 from .genre import Genre
 from .person import Actor, CareerPerson, Person
+from .read_model import FilmworkReadModel
@@ -1,6 +1,7 @@
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -27,6 +28,8 @@ class Filmwork(UpdatedCreatedMixin):
     #### Generate correct id through postgres uuid extension (in migration)
     genres = models.ManyToManyField('Genre', related_name='filmworks', through='GenreFilmwork')
     persons = models.ManyToManyField('Person', related_name='filmworks', through='PersonFilmwork')
+    # Full-text search vector of the title and the description, it's kept by a trigger of the database
+    search = SearchVectorField(null=True, editable=False)
 
     class Meta:
         db_table = settings.MOVIES_SCHEMA % 'filmwork'
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class FilmworkReadModel(models.Model):
+    """
+    Denormalized filmwork of the movies API: one row per filmwork with the type and the names
+    of genres and persons aggregated in advance, see movies.api.v1.read_model.
+
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    title = models.TextField(_('название'))
+    description = models.TextField(_('описание'), blank=True)
+    creation_date = models.DateField(_('дата создания фильма'), blank=True, null=True)
+    rating = models.FloatField(_('рейтинг'), blank=True, null=True)
+    type = models.TextField(_('тип кинопроизведения'), blank=True, null=True)
+    genres = ArrayField(models.TextField(null=True), verbose_name=_('жанры'), null=True)
+    actors = ArrayField(models.TextField(null=True), verbose_name=_('актёры'), null=True)
+    writers = ArrayField(models.TextField(null=True), verbose_name=_('сценаристы'), null=True)
+    directors = ArrayField(models.TextField(null=True), verbose_name=_('режиссёры'), null=True)
+
+    class Meta:
+        db_table = settings.MOVIES_SCHEMA % 'filmwork_read_model'
+        verbose_name = _('кинопроизведение для API')
+        verbose_name_plural = _('кинопроизведения для API')
+
+    def __str__(self):
+        return self.title
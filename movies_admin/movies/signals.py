@@ -1,6 +1,11 @@
 import datetime
+from django.conf import settings
 from django.dispatch import receiver
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from movies.api.v1 import read_model
+from movies.api.v1.registry import careers, filmwork_types
 
 # https://docs.djangoproject.com/en/3.1/ref/signals/
 @receiver(post_save, sender='movies.Person')
@@ -9,5 +14,63 @@ def congratulatory(sender, instance, created, **kwargs):
         print(f"У {instance.full_name} сегодня день рождения! 🥳")
 
 
+# Cached responses and counts of the movies API need no signals: their keys have the version of the catalog
+# kept by triggers in the database, see movies.api.v1.cache.catalog_version
+def named_movies(sender, instance) -> list:
+    # Names are shown in the movies of the person or the genre, on delete the links are deleted
+    # before with their own signals
+    field = sender._meta.concrete_model._meta.model_name
+    links = sender.filmworks.through.objects.filter(**{field: instance.pk})
+    return list(links.values_list('filmwork_id', flat=True))
+
+
+# Ids of careers and types are forgotten before the read model is refreshed with them in this process,
+# and again on commit: other processes could read the old rows in between
+def reset_registries(sender, **kwargs):
+    registry = careers if sender._meta.model_name == 'career' else filmwork_types
+    registry.clear()
+    transaction.on_commit(registry.clear)
+
+
+# The read model is refreshed in the transaction of the change, only when the API reads it
+def refresh_movie_read_model(sender, instance, **kwargs):
+    if settings.MOVIES_READ_MODEL:
+        read_model.refresh([instance.pk])
+
+
+def refresh_link_read_model(sender, instance, **kwargs):
+    if settings.MOVIES_READ_MODEL:
+        read_model.refresh([instance.filmwork_id])
+
+
+def refresh_named_read_model(sender, instance, **kwargs):
+    if settings.MOVIES_READ_MODEL:
+        read_model.refresh(named_movies(sender, instance))
+
+
+def refresh_all_read_model(sender, **kwargs):
+    # Types and careers are shared by many movies and change rarely
+    if settings.MOVIES_READ_MODEL:
+        read_model.refresh()
+
+
+# Signals of proxy models are sent with the proxy as the sender, so they are connected too
+FILMWORK_MODELS = ('movies.Filmwork', 'movies.Movie', 'movies.TVSeries')
+LINK_MODELS = ('movies.GenreFilmwork', 'movies.PersonFilmwork')
+
+RECEIVERS = (
+    (reset_registries, ('movies.FilmworkType', 'movies.Career')),
+    (refresh_movie_read_model, FILMWORK_MODELS),
+    (refresh_link_read_model, LINK_MODELS),
+    (refresh_named_read_model, ('movies.Person', 'movies.Actor', 'movies.Genre')),
+    (refresh_all_read_model, ('movies.FilmworkType', 'movies.Career')),
+)
+
+for function, senders in RECEIVERS:
+    for sender in senders:
+        for signal in (post_save, post_delete):
+            signal.connect(function, sender=sender, weak=False, dispatch_uid=f'{function.__name__}.{sender}')
+
+
 # post_save.connect(receiver=congratulatory, sender='movies.Person',
 #                   weak=True, dispatch_uid='congratulatory_signal')
@@ -24,7 +24,8 @@ CREATE TABLE "content"."filmwork" (
     "rating" double precision NULL,
     "type_id" uuid NOT NULL REFERENCES "content"."filmwork_type" DEFERRABLE INITIALLY DEFERRED,
     "created_at" timestamp with time zone NOT NULL,
-    "updated_at" timestamp with time zone NOT NULL
+    "updated_at" timestamp with time zone NOT NULL,
+    "search" tsvector NULL
     );
 
 CREATE TABLE "content"."genre" (
@@ -73,3 +74,86 @@ CREATE TABLE "content"."genres_filmworks" (
     );
 
 CREATE INDEX "persons_filmworks_person_id_561d0ff6" ON "content"."persons_filmworks" ("person_id");
+CREATE INDEX "filmwork_title_id_idx" ON "content"."filmwork" ("title", "id");
+CREATE INDEX "filmwork_search_idx" ON "content"."filmwork" USING gin ("search");
+CREATE INDEX "filmwork_rating_idx" ON "content"."filmwork" ("rating");
+CREATE INDEX "filmwork_creation_date_idx" ON "content"."filmwork" ("creation_date");
+CREATE INDEX "filmwork_type_id_idx" ON "content"."filmwork" ("type_id");
+CREATE INDEX "genres_filmworks_genre_id_idx" ON "content"."genres_filmworks" ("genre_id");
+CREATE INDEX "person_full_name_idx" ON "content"."person" ("full_name");
+
+CREATE FUNCTION public.filmwork_search_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search := setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+                  setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER "filmwork_search_update" BEFORE INSERT OR UPDATE OF "title", "description"
+    ON "content"."filmwork" FOR EACH ROW EXECUTE FUNCTION public.filmwork_search_update();
+
+CREATE TABLE "content"."filmwork_read_model" (
+    "id" uuid NOT NULL PRIMARY KEY,
+    "title" text NOT NULL,
+    "description" text NOT NULL,
+    "creation_date" date NULL,
+    "rating" double precision NULL,
+    "type" text NULL,
+    "genres" text[] NULL,
+    "actors" text[] NULL,
+    "writers" text[] NULL,
+    "directors" text[] NULL
+    );
+
+CREATE INDEX "filmwork_read_model_title_id_idx" ON "content"."filmwork_read_model" ("title", "id");
+
+CREATE TABLE public.movies_catalog_version (
+    "slot" integer NOT NULL PRIMARY KEY,
+    "version" bigint NOT NULL DEFAULT 0,
+    "modified_at" timestamp with time zone NOT NULL DEFAULT now()
+    );
+
+INSERT INTO public.movies_catalog_version ("slot") SELECT generate_series(0, 63);
+
+CREATE FUNCTION public.movies_catalog_touch() RETURNS void AS $$
+BEGIN
+    IF current_setting('movies.catalog_touched', true) IS DISTINCT FROM 'on' THEN
+        UPDATE public.movies_catalog_version
+        SET "version" = "version" + 1, "modified_at" = clock_timestamp()
+        WHERE "slot" = pg_backend_pid() % 64;
+        PERFORM set_config('movies.catalog_touched', 'on', true);
+    END IF;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION public.movies_catalog_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM public.movies_catalog_touch();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER "filmwork_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."filmwork" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+
+CREATE TRIGGER "filmwork_type_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."filmwork_type" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+
+CREATE TRIGGER "genre_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."genre" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+
+CREATE TRIGGER "genres_filmworks_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."genres_filmworks" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+
+CREATE TRIGGER "person_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."person" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+
+CREATE TRIGGER "career_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."career" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+
+CREATE TRIGGER "persons_filmworks_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."persons_filmworks" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
+
+CREATE TRIGGER "filmwork_read_model_catalog_changed" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON "content"."filmwork_read_model" FOR EACH STATEMENT EXECUTE FUNCTION public.movies_catalog_changed();
@@ -0,0 +1,145 @@
+"""Generator of a synthetic SQLite catalog with the schema of db.sqlite.
+
+Usage (from the sqlite_to_postgres directory):
+    python -m benchmark.generate --movies 100000 --output bench_100k.sqlite
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+
+# Schema of the movies SQLite database, including its quirks:
+# a single writer is stored in the writer column, several writers in the writers column as json.
+SCHEMA = '''
+CREATE TABLE actors(
+id integer primary key autoincrement,
+name text
+);
+CREATE TABLE rating_agency(
+id text(27),
+name text
+);
+CREATE TABLE movies (
+id text primary key,
+genre text,
+director text,
+writer text,
+title text,
+plot text,
+ratings text,
+imdb_rating text, writers text);
+CREATE TABLE writers(
+id text(27) primary key,
+name text
+);
+CREATE TABLE movie_actors(
+movie_id text,
+actor_id text
+);
+'''
+
+GENRES = (
+    'Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Documentary', 'Drama',
+    'Family', 'Fantasy', 'Game-Show', 'History', 'Horror', 'Music', 'Musical', 'Mystery', 'News',
+    'Reality-TV', 'Romance', 'Sci-Fi', 'Short', 'Sport', 'Talk-Show', 'Thriller', 'War', 'Western',
+)
+
+FIRST_NAMES = (
+    'George', 'Mark', 'Harrison', 'Carrie', 'Peter', 'Alec', 'Leigh', 'Lawrence', 'Irvin', 'Richard',
+    'Anthony', 'Kenny', 'David', 'James', 'Frank', 'Mary', 'Linda', 'Susan', 'Karen', 'Nancy',
+)
+
+LAST_NAMES = (
+    'Lucas', 'Hamill', 'Ford', 'Fisher', 'Cushing', 'Guinness', 'Brackett', 'Kasdan', 'Kershner',
+    'Marquand', 'Daniels', 'Baker', 'Prowse', 'Jones', 'Oz', 'Williams', 'Smith', 'Brown', 'Miller',
+)
+
+WORDS = (
+    'star', 'war', 'empire', 'return', 'hope', 'galaxy', 'force', 'dark', 'side', 'planet', 'rebel',
+    'alliance', 'princess', 'knight', 'droid', 'ship', 'battle', 'clone', 'attack', 'phantom', 'menace',
+)
+
+BATCH_SIZE = 10000
+
+
+def person_name(rnd: random.Random, number: int) -> str:
+    return f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {number}'
+
+
+def sentence(rnd: random.Random, words: int) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def generate(path: str, movies: int, seed: int = 0):
+    """Write SQLite database with the given number of movies.
+    Sizes of the other tables follow the proportions of db.sqlite:
+    ~2.7 actors, ~1.2 writers and ~3.5 actors of a movie per movie.
+    """
+    rnd = random.Random(seed)
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    actors_count = max(1, movies * 27 // 10)
+    writers_count = max(1, movies * 12 // 10)
+    directors = [person_name(rnd, number) for number in range(max(1, movies // 3))]
+
+    conn.executemany('INSERT INTO actors (id, name) VALUES (?, ?)', (
+        (number, 'N/A' if number == 1 else person_name(rnd, number))
+        for number in range(1, actors_count + 1)))
+
+    writers_ids = [f'{rnd.getrandbits(160):040x}' for _ in range(writers_count)]
+    conn.executemany('INSERT INTO writers (id, name) VALUES (?, ?)', (
+        (writer_id, 'N/A' if number == 0 else person_name(rnd, number))
+        for number, writer_id in enumerate(writers_ids)))
+
+    for start in range(0, movies, BATCH_SIZE):
+        movies_rows = []
+        actors_rows = []
+
+        for number in range(start, min(start + BATCH_SIZE, movies)):
+            movie_id = f'tt{number:07d}'
+
+            # Single writer in the writer column or several writers in the writers column
+            writers = rnd.sample(writers_ids, rnd.randint(1, 4))
+            if len(writers) == 1:
+                writer, writers_json = writers[0], ''
+            else:
+                writer, writers_json = '', json.dumps([{'id': writer_id} for writer_id in writers])
+
+            director = 'N/A' if rnd.random() < 0.3 else ', '.join(rnd.sample(directors, rnd.randint(1, 2)))
+
+            movies_rows.append((
+                movie_id,
+                ', '.join(rnd.sample(GENRES, rnd.randint(1, 4))),
+                director,
+                writer,
+                sentence(rnd, rnd.randint(1, 5)),
+                'N/A' if rnd.random() < 0.25 else sentence(rnd, rnd.randint(10, 60)),
+                None,
+                'N/A' if rnd.random() < 0.01 else f'{rnd.uniform(1, 10):.1f}',
+                writers_json,
+            ))
+            actors_rows.extend(
+                (movie_id, str(rnd.randint(1, actors_count))) for _ in range(rnd.randint(0, 7)))
+
+        conn.executemany('INSERT INTO movies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', movies_rows)
+        conn.executemany('INSERT INTO movie_actors VALUES (?, ?)', actors_rows)
+        conn.commit()
+
+    conn.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Generate synthetic SQLite catalog of movies.')
+    parser.add_argument('--movies', type=int, default=10000, help='number of movies, e.g. 10000, 100000, 1000000')
+    parser.add_argument('--output', required=True, help='path to the SQLite database')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    args = parser.parse_args()
+
+    generate(args.output, args.movies, args.seed)
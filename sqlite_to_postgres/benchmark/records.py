@@ -0,0 +1,191 @@
+"""Benchmark of the in-memory model of the loader on the transform stage.
+
+Compares the current slotted records (tuple rows, ids as 16 bytes, Role members, shared Person
+objects from the identity map) with the previous model (dict_factory rows of the group_concat query,
+regular dataclasses, uuid.UUID ids, role strings and a Person object per appearance).
+Rows of both models are fetched first, then all movies are transformed and the results are kept:
+only the transformation is timed and traced, so the retained memory shows the size of the model.
+
+Usage (from the sqlite_to_postgres directory):
+    python -m benchmark.records --sqlite bench_100k.sqlite
+"""
+import argparse
+import json
+import sqlite3
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from load_data import DEFAULT_BATCH_SIZE, Role, SQLiteLoader, make_id
+
+
+def dict_factory(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    d = {}
+    for idx, col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+
+@dataclass
+class LegacyPerson:
+    name: str
+    role: str
+    id: uuid.UUID
+
+
+@dataclass
+class LegacyMovie:
+    title: str
+    description: str
+    rating: Optional[float]
+    persons: List[LegacyPerson]
+    genres_names: List[str]
+    id: uuid.UUID
+    source_id: Optional[str] = None
+    content_hash: Optional[str] = None
+
+
+class LegacyLoader(SQLiteLoader):
+    """SQLiteLoader with the previous in-memory model."""
+
+    SQL = '''
+    WITH x as (
+        SELECT m.id, group_concat(a.name) as actors_names, group_concat(a.id) as actors_ids
+        FROM movies m
+        LEFT JOIN movie_actors ma ON m.id = ma.movie_id
+        LEFT JOIN actors a ON ma.actor_id = a.id
+        GROUP BY m.id
+    )
+    SELECT m.id, genre, director, title, plot, imdb_rating, x.actors_ids, x.actors_names,
+        CASE
+            WHEN m.writers = '' THEN '[{"id": "' || m.writer || '"}]'
+            ELSE m.writers
+        END AS writers
+    FROM movies m
+    LEFT JOIN x ON m.id = x.id
+    ORDER BY m.id
+    '''
+
+    def __init__(self, conn: sqlite3.Connection):
+        super().__init__(conn)
+        self.conn.row_factory = dict_factory
+        self.persons_ids = {}
+
+    def load_writers(self) -> dict:
+        return {writer['id']: writer['name'] for writer in self.conn.execute('SELECT DISTINCT id, name FROM writers')}
+
+    def extract_rows(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Tuple[dict, dict]]]:
+        writers = self.load_writers()
+        cursor = self.conn.execute(self.SQL)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [(row, writers) for row in rows]
+
+    def _get_legacy_person(self, key: tuple, name: str, role: str) -> LegacyPerson:
+        person_id = self.persons_ids.get(key)
+        if person_id is None:
+            person_id = self.persons_ids[key] = make_id('person', *key)
+        return LegacyPerson(name=name, role=role, id=person_id)
+
+    def _transform_row(self, row: dict, writers: dict, content_hash: Optional[str] = None) -> LegacyMovie:
+        persons = []
+        writers_set = set()
+
+        for writer in json.loads(row['writers']):
+            writer_id = writer['id']
+            if writers[writer_id] != 'N/A' and writer_id not in writers_set:
+                persons.append(self._get_legacy_person(
+                    ('writer', writer_id), writers[writer_id], Role.WRITER.value))
+                writers_set.add(writer_id)
+
+        if row['actors_names'] is not None:
+            names = row['actors_names'].split(',')
+            ids = row['actors_ids'].split(',')
+            if len(ids) != len(names):
+                keys = [('name', self.normalize_name(name)) for name in names]
+            else:
+                keys = [('actor', actor_id) for actor_id in ids]
+            persons.extend([
+                self._get_legacy_person(key, name, Role.ACTOR.value) for key, name in zip(keys, names)
+                if name != 'N/A'
+            ])
+
+        if row['director'] != 'N/A':
+            for name in row['director'].split(','):
+                name = name.strip()
+                persons.append(self._get_legacy_person(
+                    ('name', self.normalize_name(name)), name, Role.DIRECTOR.value))
+
+        return LegacyMovie(
+            id=make_id('movie', row['id']),
+            source_id=row['id'],
+            title=row['title'],
+            description=row['plot'] if row['plot'] != 'N/A' else '',
+            rating=float(row['imdb_rating']) if row['imdb_rating'] != 'N/A' else None,
+            persons=persons,
+            genres_names=self.split_genres(row['genre']),
+            content_hash=content_hash,
+        )
+
+
+MODELS = {
+    'legacy': LegacyLoader,
+    'slotted': SQLiteLoader,
+}
+
+
+def run_model(model: str, sqlite_path: str, batch_size: int, trace: bool) -> dict:
+    """Fetch all rows, then transform all movies keeping the results, runs in a fresh process.
+    :param trace: measure memory with tracemalloc, it slows down the run, so time is measured without it.
+    """
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_conn:
+        loader = MODELS[model](sqlite_conn)
+        batches = list(loader.extract_rows(batch_size))
+        movies = []
+
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for rows in batches:
+            movies.extend(loader._transform_row(row, related) for row, related in rows)
+        seconds = time.perf_counter() - start
+        if trace:
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return {'retained': retained, 'peak': peak}
+
+    return {'movies': len(movies), 'seconds': seconds}
+
+
+def run(model: str, sqlite_path: str, batch_size: int) -> dict:
+    result = {}
+    for trace in (False, True):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result.update(executor.submit(run_model, model, sqlite_path, batch_size, trace).result())
+    return result
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare in-memory models of the loader on the transform stage.')
+    parser.add_argument('--sqlite', required=True, help='path to the SQLite database, see benchmark.generate')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    results = {}
+    for model in MODELS:
+        results[model] = result = run(model, args.sqlite, args.batch_size)
+        print(f"{model:<8} {result['movies']:>9} movies {result['seconds']:>8.2f} s "
+              f"{result['retained'] / 2 ** 20:>9.1f} MB retained "
+              f"({result['retained'] / max(result['movies'], 1):>6.0f} B/movie) "
+              f"{result['peak'] / 2 ** 20:>9.1f} MB peak")
+
+    legacy, slotted = results['legacy'], results['slotted']
+    print(f"slotted model: {legacy['seconds'] / slotted['seconds']:.2f}x faster, "
+          f"{legacy['retained'] / slotted['retained']:.2f}x less retained memory")
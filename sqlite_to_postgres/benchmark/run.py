@@ -0,0 +1,190 @@
+"""Benchmark of the extract, transform and load stages of load_data.py.
+
+Every stage runs in a separate process, so the reported peak RSS belongs to that stage only.
+The load stage writes into the Postgres database from .env_load_data and needs empty content tables
+(or --truncate).
+
+Usage (from the sqlite_to_postgres directory):
+    python -m benchmark.generate --movies 100000 --output bench_100k.sqlite
+    python -m benchmark.run --sqlite bench_100k.sqlite --truncate --save-baseline 100k
+    python -m benchmark.run --sqlite bench_100k.sqlite --truncate --baseline 100k
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+import psycopg2
+
+from load_data import DEFAULT_BATCH_SIZE, PostgresSaver, SQLiteLoader, get_dsn
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+CONTENT_TABLES = (
+    'filmwork', 'genre', 'person', 'career', 'filmwork_type',
+    'genres_filmworks', 'persons_filmworks', 'careers_persons',
+)
+
+STAGES = ('extract', 'transform', 'load')
+
+
+def peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_extract(sqlite_path: str, dsn: dict, batch_size: int, bulk: bool) -> dict:
+    """Fetch all rows of the movies query with the rows of their persons."""
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_conn:
+        loader = SQLiteLoader(sqlite_conn)
+        rows = 0
+
+        start = time.perf_counter()
+        for batch in loader.extract_rows(batch_size):
+            rows += len(batch)
+        seconds = time.perf_counter() - start
+
+    return {'rows': rows, 'seconds': seconds, 'peak_rss_kb': peak_rss_kb()}
+
+
+def run_transform(sqlite_path: str, dsn: dict, batch_size: int, bulk: bool) -> dict:
+    """Transform all rows of the movies query, only the transformation is timed."""
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_conn:
+        loader = SQLiteLoader(sqlite_conn)
+        rows = 0
+        seconds = 0.0
+
+        for batch in loader.extract_rows(batch_size):
+            start = time.perf_counter()
+            movies = [loader._transform_row(row, persons_rows) for row, persons_rows in batch]
+            seconds += time.perf_counter() - start
+            rows += len(movies)
+
+    return {'rows': rows, 'seconds': seconds, 'peak_rss_kb': peak_rss_kb()}
+
+
+def run_load(sqlite_path: str, dsn: dict, batch_size: int, bulk: bool) -> dict:
+    """Save all movies into Postgres, only the saving is timed. Rows are rows of all content tables."""
+    seconds = 0.0
+
+    def timed(batches):
+        # The time between handing a batch to the saver and its request for the next one
+        nonlocal seconds
+        for batch in batches:
+            start = time.perf_counter()
+            yield batch
+            seconds += time.perf_counter() - start
+
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_conn, closing(psycopg2.connect(**dsn)) as pg_conn:
+        loader = SQLiteLoader(sqlite_conn)
+        saver = PostgresSaver(pg_conn, bulk=bulk, batch_size=batch_size)
+
+        saver.save_all_data(timed(loader.load_movies(batch_size)))
+
+        with pg_conn.cursor() as cursor:
+            rows = 0
+            for table in CONTENT_TABLES:
+                cursor.execute(f'SELECT count(*) FROM content.{table}')
+                rows += cursor.fetchone()[0]
+
+    return {'rows': rows, 'seconds': seconds, 'peak_rss_kb': peak_rss_kb()}
+
+
+RUNNERS = {
+    'extract': run_extract,
+    'transform': run_transform,
+    'load': run_load,
+}
+
+
+def prepare_target(dsn: dict, truncate: bool):
+    """Make sure the content tables are empty before the load stage."""
+    with closing(psycopg2.connect(**dsn)) as pg_conn, pg_conn.cursor() as cursor:
+        if truncate:
+            cursor.execute(f"TRUNCATE {', '.join(f'content.{table}' for table in CONTENT_TABLES)}")
+            pg_conn.commit()
+            return
+
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM content.filmwork)')
+        if cursor.fetchone()[0]:
+            sys.exit('content tables are not empty, use --truncate to clear them before the load stage')
+
+
+def run_stage(stage: str, sqlite_path: str, dsn: dict, batch_size: int, bulk: bool) -> dict:
+    """Run the stage in a fresh process and add rows per second to its result."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        result = executor.submit(RUNNERS[stage], sqlite_path, dsn, batch_size, bulk).result()
+
+    result['rows_per_sec'] = result['rows'] / result['seconds'] if result['seconds'] else 0.0
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Find stages slower or using more memory than the baseline by more than the tolerance.
+    :return: list of descriptions of regressions.
+    """
+    regressions = []
+
+    for stage, result in results.items():
+        expected = baseline.get(stage)
+        if expected is None:
+            continue
+        if result['rows_per_sec'] < expected['rows_per_sec'] * (1 - tolerance):
+            regressions.append(
+                f"{stage}: {result['rows_per_sec']:.0f} rows/sec, baseline {expected['rows_per_sec']:.0f}")
+        if result['peak_rss_kb'] > expected['peak_rss_kb'] * (1 + tolerance):
+            regressions.append(
+                f"{stage}: peak RSS {result['peak_rss_kb']} KB, baseline {expected['peak_rss_kb']} KB")
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark extract, transform and load stages of load_data.py.')
+    parser.add_argument('--sqlite', required=True, help='path to the SQLite database, see benchmark.generate')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--bulk', action='store_true', help='use the COPY write mode in the load stage')
+    parser.add_argument('--truncate', action='store_true', help='clear content tables before the load stage')
+    parser.add_argument('--save-baseline', metavar='NAME', help='save results as baselines/NAME.json')
+    parser.add_argument('--baseline', metavar='NAME', help='compare results with baselines/NAME.json')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='run every stage several times and keep the fastest run, reduces noise')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative drop of rows/sec or growth of peak RSS')
+    args = parser.parse_args()
+
+    dsn = get_dsn()
+
+    if 'load' in args.stages and not args.truncate:
+        prepare_target(dsn, truncate=False)
+
+    results = {}
+    for stage in args.stages:
+        runs = []
+        for _ in range(args.repeat):
+            if stage == 'load' and args.truncate:
+                prepare_target(dsn, truncate=True)
+            runs.append(run_stage(stage, args.sqlite, dsn, args.batch_size, args.bulk))
+
+        results[stage] = result = max(runs, key=lambda run: run['rows_per_sec'])
+        print(f"{stage:<10} {result['rows']:>10} rows {result['seconds']:>9.2f} s "
+              f"{result['rows_per_sec']:>10.0f} rows/sec {result['peak_rss_kb'] / 1024:>8.1f} MB peak RSS")
+
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(os.path.join(BASELINES_DIR, f'{args.save_baseline}.json'), 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if args.baseline:
+        with open(os.path.join(BASELINES_DIR, f'{args.baseline}.json')) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
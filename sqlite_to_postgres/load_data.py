@@ -1,34 +1,87 @@
+import argparse
+import functools
+import hashlib
+import io
 import json
 import logging
 import os
 import sqlite3
+import sys
+import time
 import uuid
-from dataclasses import dataclass, field
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
 from enum import Enum
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 import psycopg2
 from dotenv import load_dotenv
 from psycopg2.extensions import connection as _connection
-from psycopg2.extras import DictCursor
+from psycopg2.extras import DictCursor, execute_values
 
 logger = logging.getLogger()
 
+DEFAULT_BATCH_SIZE = 1000
+# Schema of the tables read by the API and the shadow schema of the staging load
+SCHEMA = 'content'
+STAGING_SCHEMA = 'content_staging'
+# Seconds between progress reports on stderr
+PROGRESS_INTERVAL = 5.0
+# Ranges of movies per worker process of the parallel load: metrics of a range are reported when it's done,
+# so there are many more of them than workers
+PARTITIONS_PER_WORKER = 8
 
-def dict_factory(cursor: sqlite3.Cursor, row: tuple) -> dict:
-    """Dict factory for row.
-    :param cursor: sqlite3 Cursor object.
-    :param row: query result.
-    :return dictionary:
-        {
-            'col_name': value,
-            ...
-        }
+# Persons kept by the identity maps of the loader and the saver, None keeps all of them. A bound keeps
+# memory from growing with the number of persons in the catalog, at the cost of time: persons dropped
+# from the maps are identified again and written again, ignored by ON CONFLICT
+IDENTITY_MAP_SIZE = None
+
+# Namespace of the ids derived from the SQLite data, the same source data always gets the same ids
+NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, 'sqlite-to-postgres.movies')
+
+
+def make_id(*parts) -> uuid.UUID:
+    """Deterministic UUIDv5 id of an entity.
+    :param parts: kind of the entity and its natural key, e.g. ('movie', 'tt0076759').
+    :return: the same id for the same parts on every run.
     """
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
+    return uuid.uuid5(NAMESPACE, '/'.join(str(part) for part in parts))
+
+
+def id_to_str(value: bytes) -> str:
+    """Serialize id kept as 16 bytes into the canonical UUID string."""
+    return str(uuid.UUID(bytes=value))
+
+
+class LruDict(OrderedDict):
+    """Dict keeping the most recently used items only, the least recently used one is dropped when it's full."""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+    def __reduce__(self):
+        # Pickled for the worker processes with its bound, items are set after it
+        return self.__class__, (self.maxsize,), None, None, iter(self.items())
+
+
+def identity_map(maxsize: Optional[int] = IDENTITY_MAP_SIZE) -> dict:
+    """Plain dict without a bound, LruDict with it: its Python methods cost time on every lookup."""
+    return {} if maxsize is None else LruDict(maxsize)
 
 
 class Role(Enum):
@@ -42,267 +95,1131 @@ class MovieType(Enum):
     TV_SHOW = 'tv_show'
 
 
-@dataclass
-class Career:
-    name: str
-    id: uuid.UUID = field(default_factory=uuid.uuid4)
-
-
+# Records of the loader are slotted dataclasses: there are millions of them during an import.
+# Ids are kept as 16 bytes (see make_id) and converted to strings only by the saver,
+# roles are members of Role.
 @dataclass
 class Person:
+    __slots__ = ('name', 'role', 'id')
     name: str
-    role: str
-    id: uuid.UUID = field(default_factory=uuid.uuid4)
+    role: Role
+    id: bytes
 
 
 @dataclass
 class Genre:
+    __slots__ = ('name', 'id')
     name: str
-    id: uuid.UUID = field(default_factory=uuid.uuid4)
+    id: bytes
 
 
 @dataclass
 class Movie:
+    __slots__ = ('title', 'description', 'rating', 'persons', 'genres_names', 'id', 'source_id', 'content_hash')
     title: str
     description: str
-    rating: float
+    rating: Optional[float]
     persons: List[Person]
     genres_names: List[str]
-    id: uuid.UUID = field(default_factory=uuid.uuid4)
+    id: bytes
+    source_id: str
+    content_hash: Optional[str]
+
+
+class Metrics:
+    """Timers and counters of the load stages.
+    Timers are named after the stages: sqlite, transform, write.<table>, commit.
+    Progress with rows/sec and ETA is reported to the stream, if it's set.
+    """
+
+    def __init__(self, total: Optional[int] = None, stream=None, interval: float = PROGRESS_INTERVAL):
+        """
+        :param total: number of movies to load, used for the ETA.
+        :param stream: file for the progress reports, e.g. sys.stderr, nothing is reported if None.
+        :param interval: minimal number of seconds between progress reports.
+        """
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.timers = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.started = self.reported = time.perf_counter()
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[stage] += time.perf_counter() - start
+
+    def count(self, counter: str, value: int = 1):
+        self.counters[counter] += value
+
+    def rows_written(self) -> int:
+        return sum(value for counter, value in self.counters.items() if counter.startswith('written.'))
+
+    def progress(self, force: bool = False):
+        """Report loaded movies, rows/sec and ETA, not more often than once per interval."""
+        now = time.perf_counter()
+        if self.stream is None or not force and now - self.reported < self.interval:
+            return
+        self.reported = now
+
+        elapsed = now - self.started
+        movies = self.counters['read.movies']
+        rate = movies / elapsed if elapsed else 0.0
+        eta = f'{(self.total - movies) / rate:.0f} s' if self.total and rate else '?'
+        print(f"{movies}/{self.total or '?'} movies, {rate:.0f} movies/sec, "
+              f"{self.rows_written() / elapsed if elapsed else 0.0:.0f} rows/sec written, ETA {eta}",
+              file=self.stream, flush=True)
+
+    def merge(self, summary: dict):
+        """Add timers and counters of a worker, see summary."""
+        for stage, seconds in summary['timers'].items():
+            self.timers[stage] += seconds
+        for counter, value in summary['counters'].items():
+            self.counters[counter] += value
+
+    def summary(self) -> dict:
+        """Metrics of the load, timers of parallel workers are summed."""
+        elapsed = time.perf_counter() - self.started
+        return {
+            'elapsed': elapsed,
+            'movies_per_sec': self.counters['read.movies'] / elapsed if elapsed else 0.0,
+            'rows_per_sec': self.rows_written() / elapsed if elapsed else 0.0,
+            'timers': dict(sorted(self.timers.items(), key=lambda item: -item[1])),
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def report(self):
+        """Report the summary of the stages, the slowest stage goes first."""
+        if self.stream is None:
+            return
+        summary = self.summary()
+        self.progress(force=True)
+        for stage, seconds in summary['timers'].items():
+            print(f'{stage:<30} {seconds:>10.2f} s', file=self.stream)
+        for counter, value in summary['counters'].items():
+            print(f'{counter:<30} {value:>10}', file=self.stream)
+        self.stream.flush()
 
 
 class SQLiteLoader:
-    SQL = '''
-    WITH x as (
-        /* Using group_concat to get ids and names of all actors into one list after join with the actors table
-        Notice that order of ids and names are same
-        Remeber that movies and actors tables have m2m relationship */
-        SELECT m.id, group_concat(a.name) as actors_names, group_concat(a.id) as actors_ids
+    MOVIES_SQL = '''
+    SELECT m.id, m.genre, m.title, m.plot, m.imdb_rating
+    FROM movies m
+    {where}
+    ORDER BY m.id
+    '''
+
+    WRITERS_JSON = "CASE WHEN m.writers = '' THEN json_array(json_object('id', m.writer)) ELSE m.writers END"
+
+    PERSONS_SQL = '''
+    WITH RECURSIVE directors(movie_id, name, rest) AS (
+        -- Directors have no ids and are stored as comma separated names in the director column
+        SELECT m.id, '', m.director || ','
         FROM movies m
-        LEFT JOIN movie_actors ma ON m.id = ma.movie_id
-        LEFT JOIN actors a ON ma.actor_id = a.id
-        GROUP BY m.id
+        WHERE m.director != 'N/A' {movies_and}
+        UNION ALL
+        SELECT movie_id, trim(substr(rest, 1, instr(rest, ',') - 1)), substr(rest, instr(rest, ',') + 1)
+        FROM directors
+        WHERE rest != ''
     )
-    -- Get list of all movies with writers and actors
-    SELECT m.id, genre, director, title, plot, imdb_rating, x.actors_ids, x.actors_names,
-        /* This CASE is solution for the problem in the table design:
-        if there is only one writer, then it saved as simple string in the writer column. 
-        Otherwise data storage in writers column as json object.
-        For fix this issue we use hack:
-        transform single value of writer into list of a single json object and put all in the writers column. */
-            CASE
-                WHEN m.writers = '' THEN '[{"id": "' || m.writer || '"}]'
-                ELSE m.writers
-            END AS writers
+    -- Remeber that movies and actors tables have m2m relationship
+    SELECT ma.movie_id, 'actor' AS role, CAST(a.id AS TEXT) AS person_id, a.name
+    FROM movie_actors ma
+    JOIN actors a ON ma.actor_id = a.id
+    WHERE a.name != 'N/A' {actors_and}
+    UNION ALL
+    /* This CASE is solution for the problem in the table design:
+    if there is only one writer, then it saved as simple string in the writer column.
+    Otherwise data storage in writers column as json list of objects with ids.
+    Single writer is transformed into the list of a single json object and json_each unnests the list.
+    Some movies list the same writer twice, DISTINCT keeps one of them. */
+    SELECT DISTINCT m.id, 'writer', w.id, w.name
     FROM movies m
-    LEFT JOIN x ON m.id = x.id
+    JOIN json_each({writers}) j
+    JOIN writers w ON w.id = json_extract(j.value, '$.id')
+    WHERE w.name != 'N/A' {movies_and}
+    UNION ALL
+    SELECT movie_id, 'director', NULL, name
+    FROM directors
+    WHERE name != ''
     '''
 
-    def __init__(self, conn:sqlite3.Connection):
+    # Numbers of persons skipped because their name is N/A
+    NA_PERSONS_SQL = '''
+    SELECT 'actor', count(*)
+    FROM movie_actors ma
+    JOIN actors a ON ma.actor_id = a.id
+    WHERE a.name = 'N/A' {actors_and}
+    UNION ALL
+    SELECT 'writer', count(*)
+    FROM movies m
+    JOIN json_each({writers}) j
+    JOIN writers w ON w.id = json_extract(j.value, '$.id')
+    WHERE w.name = 'N/A' {movies_and}
+    UNION ALL
+    SELECT 'director', count(*)
+    FROM movies m
+    WHERE m.director = 'N/A' {movies_and}
+    '''
+
+    def __init__(self, conn:sqlite3.Connection, metrics: Optional[Metrics] = None,
+                 identity_map_size: Optional[int] = IDENTITY_MAP_SIZE):
         self.conn = conn
-        self.conn.row_factory = dict_factory
+        self.metrics = metrics if metrics is not None else Metrics()
+        # Identity map of the persons by the rows of the persons query: the same source person gets the same id
+        # in every movie (see make_id), its appearances share one Person object. lru_cache keeps it in C.
+        self._get_person = functools.lru_cache(maxsize=identity_map_size)(self._make_person)
 
-    def load_writers(self) -> dict:
-        """Get list of all writers, cause there is no way to get all writers in a single request.
-        :return: dict of all writers of the form:
-            {
-                'writer_id': 'writer_name'
-            }
-        """
-        writers = {}
+    @staticmethod
+    def split_genres(genre: str) -> List[str]:
+        """Split genre column of a movie into the list of genres names."""
+        return genre.replace(' ', '').split(',')
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """Normalize person name to use it as identity key, when there is no source id."""
+        return ' '.join(name.split()).lower()
 
-        for writer in self.conn.execute('SELECT DISTINCT id, name FROM writers'):
-            writers[writer['id']] = writer['name']
-        
-        return writers
+    def _make_person(self, role: str, person_id: Optional[str], name: str) -> Person:
+        """Create person of a row of the persons query, the id is derived from the source id.
+        Called through the identity map _get_person, on the first appearance of the person.
+        :param role: role of the person in the movie.
+        :param person_id: source id of the person, None for directors, they are identified by the normalized name.
+        :param name: full name of the person.
+        :return: Person object.
+        """
+        if person_id is None:
+            return Person(name=name, role=Role(role), id=make_id('person', 'name', self.normalize_name(name)).bytes)
+        return Person(name=name, role=Role(role), id=make_id('person', role, person_id).bytes)
 
-    def _transform_row(self, row: dict, writers: dict) -> Movie:
+    def _transform_row(self, row: tuple, persons_rows: List[tuple], content_hash: Optional[str] = None) -> Movie:
         """The main logic for converting data from SQLite to an internal representation,
         which will futher go to PostgreSQL.
         Problems solved:
         1) genre on the sqldatabase is specified as a string of one or more genres,
         separated by commas -> convert to a list of Genre objects.
-        2) writers from a query in the sqldatabase comes in the form of a list of id's dictionaries ->
-        we look up correct names by ids using previously obtained all writers' names and ids then 
-        create Person object for each writer.
-        3) using query field (actors_names) we create new Person object for each actor name.
-        4) for the imdb_rating, description fields -> change the 'N/A' fields to Null.
-        5) for directors, writers, actors -> do not create Person object if name is N/A.
+        2) persons of the movie come from the persons query already resolved to names,
+        'N/A' names are filtered out there -> create Person object for each of them.
+        3) for the imdb_rating, description fields -> change the 'N/A' fields to Null.
+        4) the same person gets the same id in all movies: actors and writers are identified
+        by their source ids, directors (there is no id for them) by the normalized name.
+        :param row: row of the movies query, columns are in the order of the SELECT list.
+        :param persons_rows: (role, person_id, name) rows of the persons query for the movie.
         """
-        # Collect all related persons(actors, directors, writers) to the movie.
-        persons = []
-
-        writers_set = set()
-
-        for writer in json.loads(row['writers']):
-            writer_id = writer['id']
-            if writers[writer_id] != 'N/A' and writer_id not in writers_set:
-                persons.append(
-                    Person(name=writers[writer_id], role=Role.WRITER.value))
-                writers_set.add(writer_id)
-
-        if row['actors_names'] is not None:
-            persons.extend([
-                Person(name=name, role=Role.ACTOR.value) for name in row['actors_names'].split(',')
-                if name != 'N/A'
-            ])
+        movie_id, genre, title, plot, imdb_rating = row
+        if plot == 'N/A':
+            self.metrics.count('na.description')
+        if imdb_rating == 'N/A':
+            self.metrics.count('na.rating')
 
-        if row['director'] != 'N/A':
-            persons.extend([
-                Person(name=x.strip(), role=Role.DIRECTOR.value) for x in row['director'].split(',')])
+        # Collect all related persons(actors, directors, writers) to the movie.
+        persons = [self._get_person(role, person_id, name) for role, person_id, name in persons_rows]
 
         return Movie(
-            title=row['title'],
-            description=row['plot'] if row['plot'] != 'N/A' else '',
-            rating=float(row['imdb_rating']) if row['imdb_rating'] != 'N/A' else None,
+            id=make_id('movie', movie_id).bytes,
+            source_id=movie_id,
+            title=title,
+            description=plot if plot != 'N/A' else '',
+            rating=float(imdb_rating) if imdb_rating != 'N/A' else None,
             persons=persons,
-            genres_names=[name for name in row['genre'].replace(' ', '').split(',')],
+            genres_names=self.split_genres(genre),
+            content_hash=content_hash,
         )
  
-    def load_movies(self) -> List[Movie]:
+    @staticmethod
+    def hash_row(row: tuple, persons_rows: List[tuple]) -> str:
+        """Hash of the source data of a movie, used to find movies changed since the previous import."""
+        return hashlib.sha1(json.dumps([row, persons_rows]).encode()).hexdigest()
+
+    @staticmethod
+    def _range_condition(column: str, lower: Optional[str], upper: Optional[str]) -> List[str]:
+        conditions = []
+        if lower is not None:
+            conditions.append(f'{column} >= :lower')
+        if upper is not None:
+            conditions.append(f'{column} < :upper')
+        return conditions
+
+    def _format_range(self, sql: str, lower: Optional[str], upper: Optional[str]) -> str:
+        return sql.format(
+            writers=self.WRITERS_JSON,
+            movies_and=''.join(f' AND {c}' for c in self._range_condition('m.id', lower, upper)),
+            actors_and=''.join(f' AND {c}' for c in self._range_condition('ma.movie_id', lower, upper)),
+        )
+
+    def persons_query(self, lower: Optional[str] = None, upper: Optional[str] = None) -> str:
+        """Query of the (movie_id, role, person_id, name) rows of all persons of movies in the id range.
+        person_id is NULL for directors.
+        """
+        return self._format_range(self.PERSONS_SQL, lower, upper)
+
+    def count_movies(self, lower: Optional[str] = None, upper: Optional[str] = None) -> int:
+        """Number of movies in the id range."""
+        conditions = self._range_condition('m.id', lower, upper)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self.conn.execute(
+            f'SELECT count(*) FROM movies m {where}', {'lower': lower, 'upper': upper}).fetchone()[0]
+
+    def count_na_persons(self, lower: Optional[str] = None, upper: Optional[str] = None):
+        """Count persons of movies in the id range skipped because their name is N/A,
+        they are filtered out by the persons query.
+        """
+        for role, count in self.conn.execute(
+                self._format_range(self.NA_PERSONS_SQL, lower, upper), {'lower': lower, 'upper': upper}):
+            self.metrics.count(f'na.{role}', count)
+
+    def extract_rows(self, batch_size: int = DEFAULT_BATCH_SIZE, lower: Optional[str] = None,
+                     upper: Optional[str] = None) -> Iterator[List[Tuple[tuple, List[tuple]]]]:
+        """Fetch rows of the movies query with the rows of their persons from SQLite database in batches.
+        Both queries are ordered by movie id and are read side by side, so each of them is executed once.
+        :param batch_size: number of movies in a batch.
+        :param lower: if set, only movies with id >= lower are fetched.
+        :param upper: if set, only movies with id < upper are fetched.
+        :return: iterator over lists of (movie row, [(role, person_id, name), ...]).
+        """
+        params = {'lower': lower, 'upper': upper}
+        conditions = self._range_condition('m.id', lower, upper)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self.metrics.timer('sqlite'):
+            movies_cursor = self.conn.execute(self.MOVIES_SQL.format(where=where), params)
+            # Persons of a movie are ordered too: their order is a part of the hash of the movie
+            persons_cursor = self.conn.cursor().execute(
+                f'{self.persons_query(lower, upper)} ORDER BY 1, 2, 3, 4', params)
+            person = next(persons_cursor, None)
+
+        while True:
+            with self.metrics.timer('sqlite'):
+                rows = movies_cursor.fetchmany(batch_size)
+
+                batch = []
+                for row in rows:
+                    # Skip persons of movies missing in the movies table
+                    while person is not None and person[0] < row[0]:
+                        person = next(persons_cursor, None)
+                    persons_rows = []
+                    while person is not None and person[0] == row[0]:
+                        persons_rows.append(person[1:])
+                        person = next(persons_cursor, None)
+                    batch.append((row, persons_rows))
+
+            if not rows:
+                break
+            self.metrics.count('read.movies', len(batch))
+            yield batch
+
+    def load_movies(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                    lower: Optional[str] = None, upper: Optional[str] = None,
+                    hashes: Optional[dict] = None) -> Iterator[List[Movie]]:
         """The main method for loading all movies from SQLite database.
-        :return: list of dictionaries of trasformed data of movies.
+        Movies are fetched and transformed batch by batch, so memory usage depends on
+        the batch size and not on the size of the database.
+        :param batch_size: number of movies in a batch.
+        :param lower: if set, only movies with id >= lower are loaded.
+        :param upper: if set, only movies with id < upper are loaded.
+        :param hashes: if set, hashes of the previously imported movies of the form
+        {'source_id': 'content_hash'}, unchanged movies are skipped without transforming.
+        :return: iterator over lists of trasformed movies.
+        """
+        for rows in self.extract_rows(batch_size, lower, upper):
+            movies = []
+
+            with self.metrics.timer('transform'):
+                for row, persons_rows in rows:
+                    content_hash = self.hash_row(row, persons_rows)
+                    if hashes is not None and hashes.get(row[0]) == content_hash:
+                        self.metrics.count('skipped.unchanged')
+                        continue
+                    movies.append(self._transform_row(row, persons_rows, content_hash))
+
+            yield movies
+
+    def load_genres_names(self) -> List[str]:
+        """Get names of all genres of the movies."""
+        names = set()
+
+        for genre, in self.conn.execute('SELECT DISTINCT genre FROM movies'):
+            names.update(self.split_genres(genre))
+
+        return sorted(names)
+
+    def load_persons(self) -> Iterator[Person]:
+        """Get all persons of the movies, one per source person, with the role of their career.
+        Directors whose names differ only in case or spaces may come twice, with the same id.
         """
-        movies = []
+        for role, person_id, name in self.conn.execute(
+                f'SELECT DISTINCT role, person_id, name FROM ({self.persons_query()})'):
+            yield self._get_person(role, person_id, name)
+
+    def load_movies_ids(self) -> set:
+        """Get source ids of all movies."""
+        return {movie_id for movie_id, in self.conn.execute('SELECT id FROM movies')}
+
+    def partition_movies(self, partitions: int) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Split ids of movies into ranges with roughly the same number of movies.
+        :param partitions: number of ranges.
+        :return: list of (lower, upper) bounds for load_movies.
+        """
+        ids = [movie_id for movie_id, in self.conn.execute('SELECT id FROM movies ORDER BY id')]
+        bounds = sorted({ids[len(ids) * i // partitions] for i in range(1, partitions) if ids})
+
+        return list(zip([None] + bounds, bounds + [None]))
+
+
+def copy_value(value) -> str:
+    """Convert value into a field of the COPY text format.
+    :param value: any value with a meaningful str() or None.
+    :return: escaped field, None is converted to \\N.
+    """
+    if value is None:
+        return '\\N'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+class CopyBuffer:
+    """Buffer of rows for a single table of the content schema.
+    Rows are written with COPY ... FROM STDIN into a temporary staging table,
+    which is then merged into the target table with INSERT ... ON CONFLICT,
+    so conflicts are handled exactly as by the row by row inserts.
+    """
+
+    def __init__(self, cursor, table: str, columns: tuple, timestamps: tuple, batch_size: int,
+                 on_conflict: str = 'ON CONFLICT DO NOTHING', metrics: Optional[Metrics] = None,
+                 schema: str = SCHEMA):
+        self.cursor = cursor
+        self.schema = schema
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.table = table
+        self.columns = columns
+        self.timestamps = timestamps
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        self.staging = f'staging_{table}'
+        self.rows = []
 
-        writers = self.load_writers()
+        self.cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {self.staging} AS
+            SELECT {', '.join(columns)} FROM {schema}.{table} WITH NO DATA""")
 
-        for row in self.conn.execute(self.SQL):
-            transform_row = self._transform_row(row, writers)
-            movies.append(transform_row)
+    def append(self, row: tuple):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
 
-        return movies
+    def flush(self):
+        """Copy buffered rows into the staging table and merge them into the target table."""
+        if not self.rows:
+            return
+
+        with self.metrics.timer(f'write.{self.table}'):
+            # Rows start with the id, ON CONFLICT DO UPDATE can't change the same row twice in one statement
+            rows = {row[0]: row for row in self.rows}.values()
+            data = io.StringIO()
+            for row in rows:
+                data.write('\t'.join(copy_value(value) for value in row))
+                data.write('\n')
+            data.seek(0)
+
+            columns = ', '.join(self.columns)
+            self.cursor.copy_expert(f'COPY {self.staging} ({columns}) FROM STDIN', data)
+            self.cursor.execute(f"""
+                INSERT INTO {self.schema}.{self.table} ({', '.join(self.columns + self.timestamps)})
+                SELECT {columns}, {', '.join('NOW()' for _ in self.timestamps)} FROM {self.staging}
+                {self.on_conflict}""")
+            self.cursor.execute(f'TRUNCATE {self.staging}')
+        self.rows = []
 
 
 class PostgresSaver:
+    # Name of the checkpoint row in the import_checkpoint table
+    CHECKPOINT = 'sqlite_to_postgres'
 
-    def __init__(self, pg_conn: _connection):
+    # Columns filled by the loader and timestamp columns filled by Postgres for every table.
+    TABLES = {
+        'filmwork': (('id', 'title', 'description', 'rating', 'type_id'), ('created_at', 'updated_at')),
+        'genre': (('id', 'name'), ('created_at', 'updated_at')),
+        'person': (('id', 'full_name'), ('created_at', 'updated_at')),
+        'genres_filmworks': (('id', 'filmwork_id', 'genre_id'), ('created_at',)),
+        'careers_persons': (('id', 'career_id', 'person_id'), ('created_at',)),
+        'persons_filmworks': (('id', 'filmwork_id', 'person_id', 'role_id'), ('created_at',)),
+    }
+
+    def __init__(self, pg_conn: _connection, bulk: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+                 incremental: bool = False, metrics: Optional[Metrics] = None, schema: str = SCHEMA,
+                 identity_map_size: Optional[int] = IDENTITY_MAP_SIZE):
+        """
+        :param pg_conn: connection to Postgres database.
+        :param bulk: write rows with COPY in batches instead of one INSERT per row.
+        :param batch_size: number of rows of a table buffered before COPY in the bulk mode.
+        :param incremental: update changed movies and keep hashes of imported movies
+        and the checkpoint in the import state tables.
+        :param metrics: metrics of the load shared with the loader.
+        :param schema: schema of the saved tables.
+        :param identity_map_size: saved persons remembered by the saver, None remembers all of them.
+        """
         self.pg_conn = pg_conn
+        self.schema = schema
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.bulk = bulk
+        self.batch_size = batch_size
+        self.incremental = incremental
+        self.cursor = None
+        self.buffers = {}
+        self.careers = {}
+        self.movies_types = {}
+        # Store created genres
+        self.genres = {}
+        # Ids of saved persons of the form {id bytes: 'id'} and their (person id, career id) pairs,
+        # with a bound a person dropped from them is written again and ignored by ON CONFLICT
+        self.saved_persons = identity_map(identity_map_size)
+        self.saved_careers_persons = identity_map(identity_map_size)
 
-    def save_all_data(self, data: List[dict]):
-        """Main method for saving prepared data from SQLite database to Postgres database.
-        :param data: list of dictionaries of trasformed data of movies from SQLite database.
+    def _on_conflict(self, table: str) -> str:
+        """Conflict clause for the table: movies and persons are updated in the incremental mode,
+        otherwise conflicting rows are ignored.
+        """
+        if not self.incremental or table not in ('filmwork', 'person'):
+            return 'ON CONFLICT DO NOTHING'
+
+        columns, timestamps = self.TABLES[table]
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column != 'id')
+        clause = f'ON CONFLICT (id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at'
+        if table == 'person':
+            # A renamed source person keeps the id, persons of every changed movie come again
+            clause += ' WHERE person.full_name IS DISTINCT FROM EXCLUDED.full_name'
+        return clause
+
+    def _write(self, table: str, row: tuple):
+        """Write row into the table of the content schema, handling conflicting rows with _on_conflict.
+        :param table: name of the table from TABLES.
+        :param row: values of the loader's columns of the table.
+        """
+        self.metrics.count(f'written.{table}')
+
+        if self.bulk:
+            self.buffers[table].append(row)
+            return
+
+        columns, timestamps = self.TABLES[table]
+        values = ', '.join(['%s'] * len(columns) + ['NOW()'] * len(timestamps))
+        with self.metrics.timer(f'write.{table}'):
+            self.cursor.execute(f"""
+                INSERT INTO {self.schema}.{table} ({', '.join(columns + timestamps)})
+                VALUES ({values})
+                {self._on_conflict(table)}""", row)
+
+    def _get_existing_ids(self, table: str, names: List[str]) -> dict:
+        """Get ids of rows of the table with the given names, rows may be created outside the loader.
+        :return: dict of the form {'name': 'id'}.
         """
-        cursor = pg_conn.cursor()
+        self.cursor.execute(f"""
+            SELECT name, id FROM {self.schema}.{table}
+            WHERE name = ANY(%s)""", (names,))
+        return {name: id for name, id in self.cursor.fetchall()}
+
+    def save_reference_data(self):
+        """Save known careers and movies' types, which are shared by all movies.
+        Existing careers and types are reused, so the data can be saved again on every run.
+        """
+        cursor = self.cursor
 
         # first insert known roles
         # create dict of careers for later to determine of correct id of career
-        careers = {}
-
-        for role in Role:
-            career = Career(role.value)
-            careers[career.name] = career
+        existing = self._get_existing_ids('career', [role.value for role in Role])
+        self.careers = {
+            role: existing.get(role.value) or str(make_id('career', role.value)) for role in Role
+        }
 
         args = ','.join(cursor.mogrify("(%s, %s, NOW(), NOW())", (
-            str(career.id), career.name)).decode() for career in careers.values())
+            career_id, role.value)).decode() for role, career_id in self.careers.items())
 
         cursor.execute(f"""
-        INSERT INTO content.career (id, name, created_at, updated_at)
+        INSERT INTO {self.schema}.career (id, name, created_at, updated_at)
         VALUES {args}
+        ON CONFLICT (id) DO NOTHING
         """)
 
         # second insert known movies' types
         # create dict of movies types for later to determine of correct id of movie type
-        movies_types_dict = dict()
+        names = [movie_type.value for movie_type in MovieType]
+        existing = self._get_existing_ids('filmwork_type', names)
+        self.movies_types = dict()
 
-        for movie_type in MovieType:
+        for name in names:
 
-            movies_types_dict[movie_type.value] = str(uuid.uuid4())
-            cursor.execute("""
-            INSERT INTO content.filmwork_type (id, name, created_at, updated_at)
+            self.movies_types[name] = existing.get(name) or str(make_id('filmwork_type', name))
+            cursor.execute(f"""
+            INSERT INTO {self.schema}.filmwork_type (id, name, created_at, updated_at)
             VALUES (%s, %s, NOW(), NOW())
-            """, (movies_types_dict[movie_type.value], movie_type.value))
+            ON CONFLICT (id) DO NOTHING
+            """, (self.movies_types[name], name))
 
-        # Store created genres
-        genres_dict = dict()
+    def save_genre(self, name: str) -> str:
+        """Save genre, if it is not saved yet.
+        :param name: name of the genre.
+        :return: id of the genre.
+        """
+        if name not in self.genres:
+            genre = Genre(name, make_id('genre', name).bytes)
+            self.genres[genre.name] = id_to_str(genre.id)
+            self._write('genre', (self.genres[genre.name], genre.name))
 
-        for movie in data:
+        return self.genres[name]
 
-            cursor.execute("""
-                INSERT INTO content.filmwork (
-                    id, title, description, rating, type_id, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
-                ON CONFLICT (id) DO NOTHING""", (
-                str(movie.id), 
-                movie.title, 
-                movie.description, 
+    def save_person(self, person: Person) -> Tuple[str, str]:
+        """Save person and its career, if they are not saved yet.
+        :param person: Person object.
+        :return: ids of the person and of the career of the person's role.
+        """
+        person_id = self.saved_persons.get(person.id)
+        if person_id is None:
+            person_id = self.saved_persons[person.id] = id_to_str(person.id)
+            self._write('person', (person_id, person.name))
+
+        # Insert row in association table for m2m relationship of person and career entities
+        career_id = self.careers[person.role]
+        if self.saved_careers_persons.get((person_id, career_id)) is None:
+            self._write('careers_persons', (
+                str(make_id('careers_persons', person_id, career_id)),
+                career_id,
+                person_id,
+                ))
+            self.saved_careers_persons[(person_id, career_id)] = True
+
+        return person_id, career_id
+
+    def save_movies(self, movies: List[Movie]):
+        """Save a batch of movies with their genres and persons.
+        :param movies: list of trasformed movies from SQLite database.
+        """
+        if self.incremental and movies:
+            # Links of changed movies are saved again from scratch
+            movies_ids = [id_to_str(movie.id) for movie in movies]
+            self.cursor.execute(
+                f'DELETE FROM {self.schema}.genres_filmworks WHERE filmwork_id = ANY(%s::uuid[])', (movies_ids,))
+            self.cursor.execute(
+                f'DELETE FROM {self.schema}.persons_filmworks WHERE filmwork_id = ANY(%s::uuid[])', (movies_ids,))
+
+        for movie in movies:
+
+            movie_id = id_to_str(movie.id)
+            self._write('filmwork', (
+                movie_id,
+                movie.title,
+                movie.description,
                 movie.rating,
-                movies_types_dict['movie'],
+                self.movies_types['movie'],
                 ))
 
             for genre_name in movie.genres_names:
 
-                if genre_name not in genres_dict:
-                    genre = Genre(genre_name)
-                    cursor.execute("""
-                        INSERT INTO content.genre (id, name, created_at, updated_at)
-                        VALUES (%s, %s, NOW(), NOW())
-                        ON CONFLICT (id) DO NOTHING""", (str(genre.id), genre.name))
-                    genres_dict[genre.name] = str(genre.id)
-
                 # Insert row in association table for m2m relationship of movie and genre entities
-                cursor.execute("""
-                    INSERT INTO content.genres_filmworks (
-                        id, filmwork_id, genre_id, created_at)
-                    VALUES (%s, %s, %s, now())
-                    ON CONFLICT DO NOTHING""", (
-                    str(uuid.uuid4()), 
-                    str(movie.id), 
-                    genres_dict[genre_name],
+                genre_id = self.save_genre(genre_name)
+                self._write('genres_filmworks', (
+                    str(make_id('genres_filmworks', movie_id, genre_id)),
+                    movie_id,
+                    genre_id,
                     ))
 
             for person in movie.persons:
 
-                cursor.execute("""
-                    INSERT INTO content.person (id, full_name, created_at, updated_at)
-                    VALUES (%s, %s, NOW(), NOW())
-                    ON CONFLICT (id) DO NOTHING""", (
-                    str(person.id), 
-                    person.name,
-                    ))
-
-                # Insert row in association table for m2m relationship of movie and person entities
-                career_id = str(careers[person.role].id)
-                cursor.execute("""
-                INSERT INTO content.careers_persons(
-                    id, career_id, person_id, created_at)
-                VALUES (%s, %s, %s, NOW())
-                ON CONFLICT DO NOTHING""", (
-                    str(uuid.uuid4()),
-                    career_id,
-                    str(person.id),
-                    )
-                )
+                person_id, career_id = self.save_person(person)
 
                 # Insert row in association table for m2m relationship of movie and person entities
-                cursor.execute("""
-                    INSERT INTO content.persons_filmworks (
-                        id, filmwork_id, person_id, role_id, created_at)
-                    VALUES (%s, %s, %s, %s, NOW())
-                    ON CONFLICT DO NOTHING""", (
-                    str(uuid.uuid4()),
-                    str(movie.id),
-                    str(person.id),
+                self._write('persons_filmworks', (
+                    str(make_id('persons_filmworks', movie_id, person_id, career_id)),
+                    movie_id,
+                    person_id,
                     career_id,
                     ))
 
+        self.flush()
+
+        if self.incremental and movies:
+            self.save_import_state(movies)
+
+    def flush(self):
+        """Write all buffered rows in the bulk mode."""
+        for buffer in self.buffers.values():
+            buffer.flush()
+
+    def open(self):
+        """Create cursor and, in the bulk mode, staging tables for the saving."""
+        if self.cursor is not None:
+            return
+
+        cursor = self.cursor = self.pg_conn.cursor()
+
+        if self.bulk:
+            self.buffers = {
+                table: CopyBuffer(cursor, table, columns, timestamps, self.batch_size, self._on_conflict(table),
+                                  self.metrics, self.schema)
+                for table, (columns, timestamps) in self.TABLES.items()
+            }
+
+    def load_import_state(self) -> Tuple[dict, Optional[str]]:
+        """Create the import state tables, if they don't exist, and read the state of the previous import.
+        :return: hashes of imported movies of the form {'source_id': 'content_hash'} and the checkpoint:
+        source id of the last saved movie of an unfinished import or None.
+        """
+        self.open()
+
+        self.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.schema}.import_state (
+                source_id text NOT NULL PRIMARY KEY,
+                content_hash text NOT NULL,
+                updated_at timestamp with time zone NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS {self.schema}.import_checkpoint (
+                name text NOT NULL PRIMARY KEY,
+                last_source_id text NOT NULL,
+                updated_at timestamp with time zone NOT NULL
+            )""")
+        self.pg_conn.commit()
+
+        self.cursor.execute(f'SELECT source_id, content_hash FROM {self.schema}.import_state')
+        hashes = {source_id: content_hash for source_id, content_hash in self.cursor.fetchall()}
+
+        self.cursor.execute(
+            f'SELECT last_source_id FROM {self.schema}.import_checkpoint WHERE name = %s', (self.CHECKPOINT,))
+        checkpoint = self.cursor.fetchone()
+
+        return hashes, checkpoint[0] if checkpoint else None
+
+    def save_import_state(self, movies: List[Movie]):
+        """Save hashes of the saved movies and move the checkpoint to the last of them,
+        the state is committed together with the movies.
+        """
+        execute_values(self.cursor, f"""
+            INSERT INTO {self.schema}.import_state (source_id, content_hash, updated_at)
+            VALUES %s
+            ON CONFLICT (source_id) DO UPDATE
+            SET content_hash = EXCLUDED.content_hash, updated_at = EXCLUDED.updated_at""",
+            [(movie.source_id, movie.content_hash) for movie in movies],
+            template='(%s, %s, NOW())')
+
+        self.cursor.execute(f"""
+            INSERT INTO {self.schema}.import_checkpoint (name, last_source_id, updated_at)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (name) DO UPDATE
+            SET last_source_id = EXCLUDED.last_source_id, updated_at = EXCLUDED.updated_at""",
+            (self.CHECKPOINT, max(movie.source_id for movie in movies)))
+
+    def delete_removed_movies(self, source_ids: set) -> int:
+        """Delete movies of the previous imports which are not in the source any more,
+        their links are deleted by the foreign keys, persons and genres are kept.
+        :param source_ids: source ids of all movies of the source.
+        :return: number of deleted movies.
+        """
+        self.cursor.execute(f'SELECT source_id FROM {self.schema}.import_state')
+        removed = [source_id for source_id, in self.cursor.fetchall() if source_id not in source_ids]
+
+        if removed:
+            with self.metrics.timer('delete.filmwork'):
+                self.cursor.execute(f'DELETE FROM {self.schema}.filmwork WHERE id = ANY(%s::uuid[])',
+                                    ([str(make_id('movie', source_id)) for source_id in removed],))
+                self.cursor.execute(f'DELETE FROM {self.schema}.import_state WHERE source_id = ANY(%s)', (removed,))
+        self.metrics.count('deleted.filmwork', len(removed))
+        return len(removed)
+
+    def clear_checkpoint(self):
+        """Remove the checkpoint after the import is finished."""
+        self.cursor.execute(f'DELETE FROM {self.schema}.import_checkpoint WHERE name = %s', (self.CHECKPOINT,))
+
+    def get_reference_data(self) -> dict:
+        """Ids of the saved shared data, which let another saver save movies without saving it again."""
+        return {
+            'careers': self.careers,
+            'movies_types': self.movies_types,
+            'genres': self.genres,
+            'saved_persons': self.saved_persons,
+            'saved_careers_persons': self.saved_careers_persons,
+        }
+
+    def save_all_data(self, data: Iterable[List[Movie]], reference: Optional[dict] = None):
+        """Main method for saving prepared data from SQLite database to Postgres database.
+        Every batch of movies is committed separately.
+        :param data: iterable over batches of trasformed movies from SQLite database.
+        :param reference: shared data already saved by another saver, see get_reference_data.
+        """
+        self.open()
+
+        if reference is None:
+            self.save_reference_data()
+            self.pg_conn.commit()
+        else:
+            for name, value in reference.items():
+                setattr(self, name, value)
+
+        for movies in data:
+            self.save_movies(movies)
+            with self.metrics.timer('commit'):
+                self.pg_conn.commit()
+            self.metrics.progress()
+
+        if self.incremental:
+            self.clear_checkpoint()
+            self.pg_conn.commit()
+
+
+class DeferredConstraints:
+    """Secondary indexes, unique and foreign key constraints of the content tables deferred
+    until the end of the initial load into an empty database.
+    Definitions of the dropped objects are saved in the deferred_ddl table of the schema in the same transaction
+    as they are dropped and every object is removed from there in the transaction restoring it,
+    so an interrupted load can be simply started again: saving is idempotent (ids are derived from
+    the source keys and conflicting rows are ignored) and restoring continues with the remaining objects.
+    """
+    # Constraints and indexes of the content tables except primary keys, which are used to skip duplicates.
+    # Unique constraints are restored from the definitions of their indexes,
+    # so the indexes are built in parallel and then attached to the constraints.
+    OBJECTS_SQL = """
+        SELECT c.conrelid::regclass::text, c.conname,
+            CASE c.contype WHEN 'f' THEN 'foreign_key' ELSE 'unique' END,
+            CASE c.contype WHEN 'f' THEN pg_get_constraintdef(c.oid) ELSE pg_get_indexdef(c.conindid) END
+        FROM pg_constraint c
+        WHERE c.connamespace = %(schema)s::regnamespace AND c.contype IN ('f', 'u')
+        UNION ALL
+        SELECT i.indrelid::regclass::text, i.indexrelid::regclass::text, 'index', pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        WHERE t.relnamespace = %(schema)s::regnamespace
+            AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """
+
+    def __init__(self, dsn: dict, workers: Optional[int] = None, schema: str = SCHEMA):
+        """
+        :param dsn: parameters of the connection to Postgres, indexes are built through separate connections.
+        :param workers: number of indexes built at once, the number of CPUs by default.
+        :param schema: schema of the loaded tables.
+        """
+        self.dsn = dsn
+        self.workers = workers or os.cpu_count() or 1
+        self.schema = schema
+        self.state_table = f'{schema}.deferred_ddl'
+
+    def _pending(self, cursor) -> List[tuple]:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', (self.state_table,))
+        if not cursor.fetchone()[0]:
+            return []
+        cursor.execute(f'SELECT table_name, name, kind, definition FROM {self.state_table} ORDER BY position')
+        return cursor.fetchall()
+
+    def defer(self) -> bool:
+        """Drop the deferred objects, if the target is empty, or find the objects of an interrupted load.
+        :return: False if the content tables already have data and there is no interrupted load.
+        """
+        with closing(psycopg2.connect(**self.dsn)) as pg_conn, pg_conn.cursor() as cursor:
+            if self._pending(cursor):
+                return True
+
+            for table in PostgresSaver.TABLES:
+                cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {self.schema}.{table})')
+                if cursor.fetchone()[0]:
+                    return False
+
+            cursor.execute(self.OBJECTS_SQL, {'schema': self.schema})
+            objects = cursor.fetchall()
+
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.state_table} (
+                    position serial PRIMARY KEY,
+                    table_name text NOT NULL,
+                    name text NOT NULL,
+                    kind text NOT NULL,
+                    definition text NOT NULL
+                )""")
+            execute_values(cursor, f'INSERT INTO {self.state_table} (table_name, name, kind, definition) VALUES %s',
+                           objects)
+            for table, name, kind, _ in objects:
+                if kind == 'index':
+                    cursor.execute(f'DROP INDEX {name}')
+                else:
+                    cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name}')
+            pg_conn.commit()
+
+        return True
+
+    def _build_index(self, table: str, name: str, kind: str, definition: str):
+        """Build the index and attach it to its unique constraint, runs in its own connection."""
+        with closing(psycopg2.connect(**self.dsn)) as pg_conn, pg_conn.cursor() as cursor:
+            cursor.execute(definition)
+            if kind == 'unique':
+                cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}')
+            cursor.execute(f'DELETE FROM {self.state_table} WHERE name = %s', (name,))
+            pg_conn.commit()
+
+    def _validate(self, table: str, name: str):
+        with closing(psycopg2.connect(**self.dsn)) as pg_conn, pg_conn.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+            pg_conn.commit()
+
+    def _run_parallel(self, function, calls: List[tuple]):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in as_completed([executor.submit(function, *args) for args in calls]):
+                future.result()
+
+    def restore(self):
+        """Rebuild the indexes in parallel, add the foreign keys without checking the existing rows
+        and validate them in parallel, then analyze the tables and check that nothing is left behind.
+        """
+        with closing(psycopg2.connect(**self.dsn)) as pg_conn, pg_conn.cursor() as cursor:
+            pending = self._pending(cursor)
+
+            self._run_parallel(self._build_index, [row for row in pending if row[2] != 'foreign_key'])
 
-def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection):
+            # NOT VALID skips the check of the loaded rows, so adding takes the locks only for a moment
+            for table, name, kind, definition in pending:
+                if kind == 'foreign_key':
+                    cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID')
+                    cursor.execute(f'DELETE FROM {self.state_table} WHERE name = %s', (name,))
+            pg_conn.commit()
+
+            # Foreign keys added as NOT VALID by this or an interrupted run
+            cursor.execute("""
+                SELECT conrelid::regclass::text, conname FROM pg_constraint
+                WHERE connamespace = %s::regnamespace AND contype = 'f' AND NOT convalidated""", (self.schema,))
+            self._run_parallel(self._validate, cursor.fetchall())
+
+            left = self._pending(cursor)
+            if left:
+                raise RuntimeError(f"deferred objects are not restored: {', '.join(row[1] for row in left)}")
+            cursor.execute(f'DROP TABLE IF EXISTS {self.state_table}')
+
+            for table in PostgresSaver.TABLES:
+                cursor.execute(f'ANALYZE {self.schema}.{table}')
+            pg_conn.commit()
+
+
+class StagingSchema:
+    """Shadow copy of the live schema for a full refresh.
+    The data is loaded into the staging schema while the API and the admin keep reading the live one,
+    then the schemas are swapped by renaming them in a single short transaction.
+    """
+
+    def __init__(self, dsn: dict, live: str = SCHEMA, staging: str = STAGING_SCHEMA):
+        """
+        :param dsn: parameters of the connection to Postgres.
+        :param live: schema read by the API.
+        :param staging: schema the data is loaded into.
+        """
+        self.dsn = dsn
+        self.live = live
+        self.staging = staging
+
+    # Tables aggregated from the loaded ones, they are built in the staging schema, see build_read_model
+    READ_MODELS = ('filmwork_read_model',)
+
+    def create(self):
+        """Create the staging schema with the tables, indexes, keys and triggers of the live one.
+        Tables not written by the loader (careers, movies' types) are copied with their data,
+        so their ids don't change after the swap. The read model is created empty.
+        The staging schema of an interrupted load is created again.
+        """
+        with closing(psycopg2.connect(**self.dsn)) as pg_conn, pg_conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {self.staging} CASCADE')
+            cursor.execute(f'CREATE SCHEMA {self.staging}')
+
+            cursor.execute('SELECT tablename FROM pg_tables WHERE schemaname = %s', (self.live,))
+            for table, in cursor.fetchall():
+                cursor.execute(f'CREATE TABLE {self.staging}.{table} '
+                               f'(LIKE {self.live}.{table} INCLUDING ALL EXCLUDING INDEXES)')
+                if table not in PostgresSaver.TABLES and table not in self.READ_MODELS:
+                    cursor.execute(f'INSERT INTO {self.staging}.{table} SELECT * FROM {self.live}.{table}')
+
+            # Indexes, keys and triggers are copied from their definitions to keep their names.
+            # With the live schema as the search path the definitions of keys refer to the tables without
+            # the schema, definitions of indexes and triggers always qualify the table, so it's replaced.
+            # Trigger functions are expected outside of the live schema. Foreign keys go after the keys
+            # they reference.
+            cursor.execute(f'SET LOCAL search_path TO {self.live}')
+            cursor.execute("""
+                SELECT statement FROM (
+                    SELECT format('ALTER TABLE %%s ADD CONSTRAINT %%I %%s',
+                        conrelid::regclass, conname, pg_get_constraintdef(oid)) AS statement,
+                        CASE contype WHEN 'f' THEN 2 ELSE 1 END AS position
+                    FROM pg_constraint
+                    WHERE connamespace = %(schema)s::regnamespace AND contype IN ('p', 'u', 'x', 'f')
+                    UNION ALL
+                    SELECT replace(pg_get_indexdef(i.indexrelid), %(live)s, %(staging)s), 1
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indrelid
+                    WHERE c.relnamespace = %(schema)s::regnamespace
+                        AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+                    UNION ALL
+                    SELECT replace(pg_get_triggerdef(t.oid), %(live)s, %(staging)s), 3
+                    FROM pg_trigger t
+                    JOIN pg_class c ON c.oid = t.tgrelid
+                    WHERE c.relnamespace = %(schema)s::regnamespace AND NOT t.tgisinternal
+                ) AS statements
+                ORDER BY position""", {
+                'schema': self.live, 'live': f' ON {self.live}.', 'staging': f' ON {self.staging}.'})
+            statements = [statement for statement, in cursor.fetchall()]
+
+            cursor.execute(f'SET LOCAL search_path TO {self.staging}')
+            for statement in statements:
+                cursor.execute(statement)
+            pg_conn.commit()
+
+    def build_read_model(self) -> bool:
+        """Aggregate the loaded filmworks into the read model of the movies API (DJANGO_MOVIES_READ_MODEL),
+        the same rows as movies_read_model_rebuild makes: the type, sorted distinct names of genres and of
+        the persons of every role.
+        :return: False if the live schema has no read model (its migration is not applied).
+        """
+        persons = ''.join(f"""
+            ARRAY(SELECT DISTINCT p.full_name FROM {self.staging}.persons_filmworks pf
+                  JOIN {self.staging}.person p ON p.id = pf.person_id
+                  JOIN {self.staging}.career c ON c.id = pf.role_id
+                  WHERE pf.filmwork_id = fw.id AND c.name = '{role.value}'
+                  ORDER BY p.full_name),""" for role in (Role.ACTOR, Role.WRITER, Role.DIRECTOR))
+
+        with closing(psycopg2.connect(**self.dsn)) as pg_conn, pg_conn.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', (f'{self.staging}.filmwork_read_model',))
+            if cursor.fetchone()[0] is None:
+                return False
+
+            cursor.execute(f"""
+                INSERT INTO {self.staging}.filmwork_read_model
+                    (id, title, description, creation_date, rating, type, genres, actors, writers, directors)
+                SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating, t.name,
+                    ARRAY(SELECT DISTINCT g.name FROM {self.staging}.genres_filmworks gf
+                          JOIN {self.staging}.genre g ON g.id = gf.genre_id
+                          WHERE gf.filmwork_id = fw.id
+                          ORDER BY g.name),{persons.rstrip(',')}
+                FROM {self.staging}.filmwork fw
+                LEFT JOIN {self.staging}.filmwork_type t ON t.id = fw.type_id""")
+            pg_conn.commit()
+        return True
+
+    def swap(self):
+        """Make the staging schema live, the previous live schema is dropped.
+        Renaming only changes the catalog, so queries reading the live tables don't block the swap
+        and the queries started after it read the new tables.
+        Renaming fires no triggers, so the version of the catalog (public.movies_catalog_version, read by the API
+        for its validators and cache keys) is bumped by the same transaction.
+        """
+        old = f'{self.live}_old'
+
+        with closing(psycopg2.connect(**self.dsn)) as pg_conn, pg_conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {old} CASCADE')
+            cursor.execute(f'ALTER SCHEMA {self.live} RENAME TO {old}')
+            cursor.execute(f'ALTER SCHEMA {self.staging} RENAME TO {self.live}')
+            cursor.execute("""
+                DO $$ BEGIN
+                    IF to_regproc('public.movies_catalog_touch') IS NOT NULL THEN
+                        PERFORM public.movies_catalog_touch();
+                    END IF;
+                END $$""")
+            pg_conn.commit()
+
+            # Waits for the queries started before the swap
+            cursor.execute(f'DROP SCHEMA {old} CASCADE')
+            pg_conn.commit()
+
+
+def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection,
+                     bulk: bool = False, batch_size: int = DEFAULT_BATCH_SIZE, incremental: bool = False,
+                     metrics: Optional[Metrics] = None, schema: str = SCHEMA,
+                     identity_map_size: Optional[int] = IDENTITY_MAP_SIZE):
     """Основной метод загрузки данных из SQLite в Postgres"""
-    postgres_saver = PostgresSaver(pg_conn)
-    sqlite_loader = SQLiteLoader(connection)
+    metrics = metrics if metrics is not None else Metrics()
+    postgres_saver = PostgresSaver(pg_conn, bulk=bulk, batch_size=batch_size, incremental=incremental,
+                                   metrics=metrics, schema=schema, identity_map_size=identity_map_size)
+    sqlite_loader = SQLiteLoader(connection, metrics, identity_map_size)
 
-    data = sqlite_loader.load_movies()
+    hashes = checkpoint = None
+    if incremental:
+        # An unfinished import is resumed from its checkpoint, unchanged movies are skipped
+        hashes, checkpoint = postgres_saver.load_import_state()
+
+    metrics.total = sqlite_loader.count_movies(lower=checkpoint)
+    sqlite_loader.count_na_persons(lower=checkpoint)
+
+    data = sqlite_loader.load_movies(batch_size, lower=checkpoint, hashes=hashes)
     postgres_saver.save_all_data(data)
 
+    if incremental:
+        postgres_saver.delete_removed_movies(sqlite_loader.load_movies_ids())
+        pg_conn.commit()
 
-if __name__ == '__main__':
 
+def load_partition(sqlite_path: str, dsn: dict, lower: Optional[str], upper: Optional[str],
+                   reference: dict, bulk: bool, batch_size: int, schema: str = SCHEMA,
+                   identity_map_size: Optional[int] = IDENTITY_MAP_SIZE) -> dict:
+    """Load movies with ids in [lower, upper) through separate connections, runs in a worker process.
+    :param reference: shared data saved by PostgresSaver.get_reference_data.
+    :return: summary of the metrics of the partition.
+    """
+    metrics = Metrics()
+
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_conn, closing(psycopg2.connect(**dsn)) as pg_conn:
+        sqlite_loader = SQLiteLoader(sqlite_conn, metrics, identity_map_size)
+        postgres_saver = PostgresSaver(pg_conn, bulk=bulk, batch_size=batch_size, metrics=metrics, schema=schema,
+                                       identity_map_size=identity_map_size)
+
+        sqlite_loader.count_na_persons(lower, upper)
+        postgres_saver.save_all_data(sqlite_loader.load_movies(batch_size, lower, upper), reference)
+
+    return metrics.summary()
+
+
+def load_parallel(sqlite_path: str, dsn: dict, workers: int,
+                  bulk: bool = False, batch_size: int = DEFAULT_BATCH_SIZE, metrics: Optional[Metrics] = None,
+                  schema: str = SCHEMA, identity_map_size: Optional[int] = IDENTITY_MAP_SIZE):
+    """Load data from SQLite into Postgres with a pool of worker processes.
+    Careers, movies' types, genres and persons are shared by movies, so they are saved once
+    before the workers start and the workers never race on them. Then ids of movies are split into
+    ranges, every range is transformed in a worker process and saved through its own connection.
+    Metrics of the workers are merged into the metrics as the partitions are finished, there are
+    PARTITIONS_PER_WORKER of them per worker, so progress is reported during the load.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_conn, closing(psycopg2.connect(**dsn)) as pg_conn:
+        sqlite_loader = SQLiteLoader(sqlite_conn, metrics, identity_map_size)
+        postgres_saver = PostgresSaver(pg_conn, bulk=bulk, batch_size=batch_size, metrics=metrics, schema=schema,
+                                       identity_map_size=identity_map_size)
+        metrics.total = sqlite_loader.count_movies()
+
+        postgres_saver.open()
+        postgres_saver.save_reference_data()
+        for name in sqlite_loader.load_genres_names():
+            postgres_saver.save_genre(name)
+        for person in sqlite_loader.load_persons():
+            postgres_saver.save_person(person)
+        postgres_saver.flush()
+        pg_conn.commit()
+
+        reference = postgres_saver.get_reference_data()
+        partitions = sqlite_loader.partition_movies(workers * PARTITIONS_PER_WORKER)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(load_partition, sqlite_path, dsn, lower, upper, reference, bulk, batch_size, schema,
+                            identity_map_size)
+            for lower, upper in partitions
+        ]
+        for future in as_completed(futures):
+            metrics.merge(future.result())
+            metrics.progress()
+
+
+def get_dsn() -> dict:
+    """Parameters of the connection to Postgres from the environment or the .env_load_data file."""
     basedir = os.path.abspath(os.path.dirname(__file__))
 
     load_dotenv(os.path.join(basedir, '.env_load_data'))
 
-    dsn = {
+    return {
         'dbname': os.environ.get('SD_POSTGRES_DBNAME'), 
         'user': os.environ.get('SD_POSTGRES_USER'),
         'password': os.environ.get('SD_POSTGRES_PASSWORD'),
@@ -310,5 +1227,80 @@ if __name__ == '__main__':
         'port': os.environ.get('SD_POSTGRES_PORT', 5432)
         }
 
-    with sqlite3.connect('db.sqlite') as sqlite_conn, psycopg2.connect(**dsn, cursor_factory=DictCursor) as pg_conn:
-        load_from_sqlite(sqlite_conn, pg_conn)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Load movies from SQLite database into Postgres.')
+    parser.add_argument('--sqlite', default='db.sqlite', help='path to the SQLite database')
+    parser.add_argument('--bulk', action='store_true',
+                        help='write tables with COPY through staging tables instead of row by row INSERTs')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='number of movies loaded and committed at once, '
+                             'also the number of rows written by a single COPY in the bulk mode')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes, each one loads its own range of movies')
+    parser.add_argument('--incremental', action='store_true',
+                        help='save only new and changed movies, delete the movies removed from the SQLite database '
+                             'and resume an unfinished import from its checkpoint, the state is kept '
+                             'in content.import_state')
+    parser.add_argument('--fast-initial-load', action='store_true',
+                        help='load into empty content tables in the bulk mode with secondary indexes, unique and '
+                             'foreign key constraints dropped, then rebuild them in parallel; '
+                             'an interrupted load is resumed by running it again')
+    parser.add_argument('--staging', action='store_true',
+                        help=f'load a full refresh into the {STAGING_SCHEMA} schema as with --fast-initial-load, '
+                             f'then swap it with the {SCHEMA} schema, the API keeps reading the old data until then')
+    parser.add_argument('--identity-map-size', type=int, default=IDENTITY_MAP_SIZE, metavar='N',
+                        help='persons remembered by the loader and by every saver, all of them by default; '
+                             'bounds the memory of catalogs with many persons, the forgotten ones are written again')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='write timers of the stages and counters of rows into the JSON file at the end')
+    parser.add_argument('--quiet', action='store_true', help='do not report progress on stderr')
+    args = parser.parse_args()
+
+    if args.incremental and args.workers > 1:
+        parser.error('--incremental can not be used with --workers')
+    if args.incremental and (args.fast_initial_load or args.staging):
+        parser.error('--incremental can not be used with --fast-initial-load or --staging')
+
+    dsn = get_dsn()
+    fast_initial_load = args.fast_initial_load or args.staging
+    bulk = args.bulk or fast_initial_load
+    schema = STAGING_SCHEMA if args.staging else SCHEMA
+    metrics = Metrics(stream=None if args.quiet else sys.stderr)
+
+    if args.staging:
+        staging = StagingSchema(dsn)
+        with metrics.timer('staging.create'):
+            staging.create()
+
+    if fast_initial_load:
+        deferred = DeferredConstraints(dsn, schema=schema)
+        with metrics.timer('deferred.drop'):
+            if not deferred.defer():
+                parser.error('--fast-initial-load needs empty content tables')
+
+    if args.workers > 1:
+        load_parallel(args.sqlite, dsn, args.workers, bulk=bulk, batch_size=args.batch_size, metrics=metrics,
+                      schema=schema, identity_map_size=args.identity_map_size)
+    else:
+        with sqlite3.connect(args.sqlite) as sqlite_conn, psycopg2.connect(**dsn, cursor_factory=DictCursor) as pg_conn:
+            load_from_sqlite(sqlite_conn, pg_conn, bulk=bulk, batch_size=args.batch_size,
+                             incremental=args.incremental, metrics=metrics, schema=schema,
+                             identity_map_size=args.identity_map_size)
+
+    if fast_initial_load:
+        with metrics.timer('deferred.restore'):
+            deferred.restore()
+
+    if args.staging:
+        # The API reads the read model from the staging schema right after the swap
+        with metrics.timer('staging.read_model'):
+            staging.build_read_model()
+        with metrics.timer('staging.swap'):
+            staging.swap()
+
+    metrics.report()
+    if args.metrics:
+        with open(args.metrics, 'w') as file:
+            json.dump(metrics.summary(), file, indent=4)